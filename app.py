@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
-import io
-import re
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
+import functools
+import copy
 import os
+import contextlib
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from sitrans import almacen, busqueda, diagnostico, exportar, historico, ingesta, kpi, pipeline, vivo
 
 # 1. CONFIGURACIÓN DE PÁGINA
 st.set_page_config(
@@ -15,532 +18,578 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# --- CONFIGURACIÓN DE UMBRALES SEMÁFORO (MINUTOS) ---
-UMBRALES_SEMAFORO = {
-    "Conexión a Stacking":       [15, 30],  
-    "Desconexión para Embarque": [15, 30], 
-    "Conexión OnBoard":          [15, 30]   
-}
-
-# --- CSS VISUAL (ESTÉTICA) ---
-st.markdown("""
-    <style>
-    .stApp { background-color: #ffffff !important; color: #333333; }
-    .block-container { padding-top: 1rem !important; }
-    
-    .header-data-box {
-        background-color: white;
-        padding: 20px;
-        border-radius: 12px;
-        border-left: 6px solid #003366; 
-        box-shadow: 0 4px 15px rgba(0,0,0,0.08);
-        margin-bottom: 25px;
-        display: flex;
-        justify-content: space-around;
-        align-items: center;
-        border: 1px solid #f0f0f0;
-    }
-    .header-item { text-align: center; }
-    .header-label { font-size: 11px; color: #888; text-transform: uppercase; letter-spacing: 1.5px; margin-bottom: 4px;}
-    .header-value { font-size: 20px; font-weight: 700; color: #003366; }
-    
-    .stTabs [data-baseweb="tab-list"] { gap: 8px; }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        background-color: #f8f9fa;
-        border-radius: 6px;
-        border: 1px solid #e9ecef;
-        padding: 0 20px;
-        font-weight: 600;
-        color: #6c757d;
-        transition: all 0.2s;
-    }
-    .stTabs [data-baseweb="tab"][aria-selected="true"] {
-        background-color: #e3f2fd !important;
-        color: #003366 !important;
-        border: 1px solid #003366;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-    }
-    
-    .metric-card {
-        background-color: white;
-        border: 1px solid #e0e0e0;
-        border-radius: 12px;
-        padding: 15px;
-        text-align: center;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-        height: 100px;
-        display: flex;
-        flex-direction: column;
-        justify-content: center;
-        align-items: center;
-        margin-bottom: 10px;
-    }
-    .metric-val { font-size: 24px; font-weight: 700; color: #003366; }
-    .metric-lbl { font-size: 12px; color: #777; margin-top: 4px; text-transform: uppercase;}
-    
-    .alert-box {
-        padding: 12px;
-        border-radius: 8px;
-        margin-bottom: 8px;
-        text-align: center;
-        font-weight: 600;
-        font-size: 14px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        gap: 10px;
-    }
-    .alert-red { background-color: #fff5f5; color: #c53030; border: 1px solid #feb2b2; }
-    .alert-green { background-color: #f0fff4; color: #2f855a; border: 1px solid #9ae6b4; }
-    
-    div[role="radiogroup"] {
-        background-color: white;
-        padding: 4px; 
-        border-radius: 12px;
-        border: 1px solid #e0e0e0;
-        display: flex;
-        justify-content: space-between;
-        width: 100%;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.02);
-    }
-    div[role="radiogroup"] label {
-        flex-grow: 1;
-        text-align: center;
-        margin: 0 2px;
-        border-radius: 8px;
-        padding: 6px 8px;
-        font-weight: 500;
-        border: 1px solid transparent;
-        transition: all 0.2s;
-        font-size: 14px;
-    }
-    div[role="radiogroup"] label:hover {
-        background-color: #f8f9fa;
-        border-color: #dee2e6;
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-# --- CONFIGURACIÓN LÓGICA MONITOR ---
-ARCHIVO_MAESTRO = "monitor_maestro_acumulado.xlsx"
-COLS_SENSORES = ['SENSOR1_TMP', 'SENSOR2_TMP', 'SENSOR3_TMP', 'SENSOR4_TMP']
-
-# --- FUNCIONES SOPORTE ---
-@st.cache_data(show_spinner=False)
-def formatear_duracion(minutos):
-    if pd.isna(minutos): return ""
-    if minutos < 0: minutos = 0 
-    segundos = int(minutos * 60)
-    return f"{segundos//3600}:{(segundos%3600)//60:02d}:{segundos%60:02d}"
+# --- RECURSOS ESTÁTICOS (ESTÉTICA) ---
+AQUI = os.path.dirname(os.path.abspath(__file__))
 
-@st.cache_data(show_spinner=False)
-def extraer_metadatos(file):
-    metadatos = {"Nave": "---", "Rotación": "Indefinida", "Fecha": "---"}
+@st.cache_resource
+def recursos_estaticos():
+    """(bloque <style>, bytes del logo o None), leídos del disco una vez por proceso."""
+    with open(os.path.join(AQUI, "estilos.css"), encoding="utf-8") as f: css = f"<style>\n{f.read()}</style>"
     try:
-        df_head = pd.read_excel(file, header=None, nrows=20)
-        texto = " ".join(df_head.astype(str).stack().tolist()).upper()
-        match_fecha = re.search(r'(\d{2}[/-]\d{2}[/-]\d{4}\s+\d{1,2}:\d{2})', texto)
-        if match_fecha: metadatos["Fecha"] = match_fecha.group(1)
-        else:
-            match_solo = re.search(r'(\d{2}[/-]\d{2}[/-]\d{4})', texto)
-            if match_solo: metadatos["Fecha"] = match_solo.group(1)
-
-        for i, row in df_head.iterrows():
-            fila = [str(x).strip().upper() for x in row if pd.notna(x)]
-            for j, val in enumerate(fila):
-                if "NAVE" in val:
-                    if ":" in val and len(val.split(":")) > 1: metadatos["Nave"] = val.split(":")[1].strip()
-                    elif j+1 < len(fila): metadatos["Nave"] = fila[j+1]
-                if any(x in val for x in ["ROTACION", "ROTACIÓN", "VIAJE"]):
-                    if ":" in val and len(val.split(":")) > 1: metadatos["Rotación"] = val.split(":")[1].strip()
-                    elif j+1 < len(fila): metadatos["Rotación"] = fila[j+1]
-        return metadatos
-    except: return metadatos
-
+        with open(os.path.join(AQUI, "Logo.png"), "rb") as f: logo = f.read()
+    except OSError: logo = None
+    return css, logo
+
+css_app, logo_app = recursos_estaticos()
+st.markdown(css_app, unsafe_allow_html=True)
+
+# --- GRÁFICOS ---
+# plotly se importa recién al dibujar el primer gráfico (no al abrir la app); la torta y
+# el indicador salen de plantillas armadas una vez por proceso, cambiando solo sus datos
+@st.cache_resource
+def _plantillas():
+    import plotly.graph_objects as go
+    torta = go.Figure(go.Pie(hole=0.6, showlegend=True, hovertemplate="Color=%{label}<br>Cantidad=%{value}<extra></extra>"))
+    torta.update_layout(showlegend=True, margin=dict(t=20,b=20,l=20,r=20), height=230, legend=dict(orientation="h", y=-0.2, tracegroupgap=0))
+    indicador = go.Figure(go.Indicator(
+        mode = "gauge+number",
+        number = {
+            'suffix': "%", 
+            'valueformat': ".1f",
+            'font': {'size': 38, 'weight': 'bold'}
+        },
+        gauge = {
+            'axis': {'range': [0, 100]},
+            'bar': {'color': "rgba(0,0,0,0)"},
+            'steps': [
+                {'range': [0, 33.33], 'color': "#dc3545"},
+                {'range': [33.33, 66.66], 'color': "#ffc107"},
+                {'range': [66.66, 100], 'color': "#28a745"}
+            ]
+        }
+    ))
+    indicador.update_layout(height=230, margin=dict(t=20, b=20, l=45, r=45))
+    return {"torta": torta.to_dict(), "indicador": indicador.to_dict()}
+
+def _fundir(base, cambios):
+    for clave, valor in cambios.items():
+        if isinstance(valor, dict): _fundir(base.setdefault(clave, {}), valor)
+        else: base[clave] = valor
+    return base
+
+def figura(nombre, **datos):
+    """Figura (dict) de la plantilla `nombre` con `datos` fundidos en su traza; el layout se comparte."""
+    plantilla = _plantillas()[nombre]
+    return {"data": [_fundir(copy.deepcopy(plantilla["data"][0]), datos)], "layout": plantilla["layout"]}
+
+def _con_mediciones(funcion, contenidos):
+    # Las mediciones de la ingesta quedan en caché junto al resultado
+    archivos = [ingesta.en_memoria(nombre, contenido) for nombre, contenido in contenidos]
+    with diagnostico.capturar() as mediciones:
+        resultado = funcion(archivos)
+    return resultado, mediciones
+
+# Las funciones cacheadas reciben (nombre, bytes) y no escriben en la página:
+# procesar_rotacion también se llama desde el hilo de precarga.
+# Las cachés son del proceso: si diez sesiones suben los mismos archivos, se parsean una vez.
 @st.cache_data(show_spinner=False)
-def cargar_excel(file, palabra_clave):
-    try:
-        df_temp = pd.read_excel(file, header=None)
-        for i, row in df_temp.iterrows():
-            vals = [str(v).strip().upper() for v in row]
-            if palabra_clave in vals:
-                df = pd.read_excel(file, header=i)
-                cols = pd.Series(df.columns)
-                for c_idx, col in enumerate(df.columns):
-                    col_str = str(col).strip().upper()
-                    if (cols.astype(str).str.strip().str.upper() == col_str).sum() > 1:
-                        count = (cols[:c_idx].astype(str).str.strip().str.upper() == col_str).sum()
-                        if count > 0: col_str = f"{col_str}.{count}"
-                    cols[c_idx] = col_str
-                df.columns = cols
-                return df
-        return None
-    except: return None
-
-# --- FUNCIONES LÓGICA MONITOR ---
-
-def limpiar_y_unificar_columnas(df):
-    df.columns = df.columns.str.strip().str.upper()
-    df = df.loc[:, ~df.columns.duplicated()]
-    for col_base in COLS_SENSORES:
-        col_sufijo = f"{col_base}.1"
-        if col_base in df.columns and col_sufijo in df.columns:
-            df[col_base] = df[col_base].fillna(df[col_sufijo])
-            df = df.drop(columns=[col_sufijo])
-    return df
-
-def procesar_batch_monitores(lista_archivos):
-    # Cargar maestro si existe
-    if os.path.exists(ARCHIVO_MAESTRO):
-        try:
-            df_maestro = pd.read_excel(ARCHIVO_MAESTRO)
-            if 'UNIDAD' in df_maestro.columns:
-                df_maestro = df_maestro.set_index('UNIDAD')
-            else: df_maestro = pd.DataFrame()
-        except: df_maestro = pd.DataFrame()
-    else: df_maestro = pd.DataFrame()
-
-    for archivo in lista_archivos:
-        try:
-            # Importante: al ser upload file, asegurar lectura desde inicio
-            archivo.seek(0)
-            df_nuevo = pd.read_excel(archivo, header=3)
-            df_nuevo = limpiar_y_unificar_columnas(df_nuevo)
-            
-            if 'UNIDAD' not in df_nuevo.columns:
-                st.warning(f"Archivo ignorado: No se encontró la columna 'UNIDAD' en fila 4.")
-                continue
-
-            df_nuevo = df_nuevo.drop_duplicates(subset=['UNIDAD'])
-            df_nuevo = df_nuevo.set_index('UNIDAD')
-            
-            if df_maestro.empty: df_maestro = df_nuevo
-            else: df_maestro = df_nuevo.combine_first(df_maestro)
-                
-        except Exception as e:
-            st.error(f"Error procesando archivo {archivo.name}: {e}")
-
-    if df_maestro.empty: return None
-
-    def es_reefer_ct(row):
-        es_ct = False
-        for col in COLS_SENSORES:
-            if col in row and pd.notna(row[col]) and str(row[col]).strip() != "":
-                es_ct = True
-                break
-        return "CT" if es_ct else "General"
+def indexar_rotaciones(contenidos_rep):
+    return _con_mediciones(pipeline.indexar_rotaciones, contenidos_rep)
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def procesar_rotacion(contenidos_rep, version_maestro, parcial):
+    # Un solo DataFrame compartido por todas las sesiones (solo lectura: kpis_rotacion trabaja
+    # sobre una copia). version_maestro invalida la entrada cuando otra sesión integra monitores.
+    # `parcial` no tiene valor por defecto: la clave sale de los argumentos tal como se pasan
+    # y la precarga tiene que caer en la misma entrada que lee la página.
+    return _con_mediciones(lambda archivos: pipeline.procesar_rotacion(archivos, parcial=parcial), contenidos_rep)
+
+# --- INGESTA DE MONITORES EN SEGUNDO PLANO ---
+INTERVALO_PROGRESO_SEG = 0.5
+
+@st.cache_resource
+def _ingestas():
+    # Un hilo por proceso integra los monitores; los trabajos (por contenido) se comparten entre sesiones
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingesta"), {}, threading.Lock()
+
+def _integrar_en_fondo(trabajo, archivos):
+    with diagnostico.capturar() as mediciones:
+        trabajo["avisos"], _ = pipeline.integrar_monitores(archivos, progreso=trabajo["progreso"], cancelar=trabajo["cancelar"])
+    trabajo["mediciones"] = mediciones
+
+def huella(contenidos):
+    """(nombre, hash del contenido) por archivo: identifica una carga sin guardar sus bytes."""
+    return tuple((nombre, hashlib.blake2b(contenido, digest_size=16).digest()) for nombre, contenido in contenidos)
+
+def ingesta_monitores(contenidos_mon):
+    """(clave, trabajo) que integra estos monitores; se lanza la primera vez que se piden."""
+    ejecutor, trabajos, lock = _ingestas()
+    clave = huella(contenidos_mon)
+    with lock:
+        if clave not in trabajos:
+            archivos = [ingesta.en_memoria(nombre, contenido) for nombre, contenido in contenidos_mon]
+            trabajo = {"progreso": pipeline.progreso_inicial(archivos), "cancelar": threading.Event(), "avisos": [], "mediciones": []}
+            trabajo["futuro"] = ejecutor.submit(_integrar_en_fondo, trabajo, archivos)
+            trabajos[clave] = trabajo
+        return clave, trabajos[clave]
+
+def tabla_progreso(trabajo):
+    tabla = pd.DataFrame(trabajo["progreso"])
+    tabla.columns = ["Archivo", "Estado", "Filas", "Error"]
+    return tabla
+
+@st.fragment(run_every=INTERVALO_PROGRESO_SEG)
+def progreso_ingesta(trabajo, version):
+    # Se refresca solo; recarga la página cuando se integra otro monitor o termina el trabajo
+    if trabajo["futuro"].done() or almacen.version_maestro() != version: st.rerun()
+    progreso = trabajo["progreso"]
+    hechos = sum(p["estado"] not in ("En cola", "Leído") for p in progreso)
+    c_barra, c_boton = st.columns([5, 1], vertical_alignment="center")
+    c_barra.progress(hechos / len(progreso), text=f"🔄 Integrando monitores: {hechos} de {len(progreso)}. La vista muestra lo integrado hasta ahora.")
+    if c_boton.button("⏹️ Cancelar", disabled=trabajo["cancelar"].is_set(), use_container_width=True):
+        trabajo["cancelar"].set()
+    with st.expander("Detalle por archivo"):
+        st.dataframe(tabla_progreso(trabajo), hide_index=True, use_container_width=True)
+
+@st.cache_resource
+def _precarga():
+    # Un hilo por proceso calcula en segundo plano las rotaciones no seleccionadas
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="precarga"), set()
+
+def precargar_rotaciones(contenidos_rep, indice, seleccion, version, ahora):
+    ejecutor, enviadas = _precarga()
+    for label, posiciones in indice.items():
+        contenidos = tuple(contenidos_rep[i] for i in posiciones)
+        # Por contenido, como la caché de procesar_rotacion (el mismo nombre y tamaño no basta)
+        clave = (label, huella(contenidos), version)
+        if label == seleccion or clave in enviadas: continue
+        enviadas.add(clave)
+        ejecutor.submit(_precargar, contenidos, version, label, ahora)
+
+def _precargar(contenidos, version, rotacion, ahora):
+    (df_master, _), _ = procesar_rotacion(contenidos, version, False)
+    if df_master is not None: registrar_historico(df_master, df_master.attrs.get('id_dataset'), rotacion, ahora)
+
+def precargar_vivo(estado, seleccion, ahora):
+    # En vivo también se arman (y quedan en el histórico) las rotaciones que nadie abrió
+    ejecutor, enviadas = _precarga()
+    for label in vivo.indice(estado):
+        clave = (estado["carpeta"], label, estado["version"])
+        if label == seleccion or clave in enviadas: continue
+        enviadas.add(clave)
+        ejecutor.submit(_precargar_vivo, estado, label, ahora)
+
+def _precargar_vivo(estado, rotacion, ahora):
+    df_master, _ = vivo.rotacion(estado, rotacion)
+    if df_master is not None: registrar_historico(df_master, df_master.attrs.get('id_dataset'), rotacion, ahora)
+
+@st.cache_resource
+def estado_vivo(carpeta):
+    # Un estado por carpeta, compartido por todas las sesiones que la vigilan
+    return vivo.nuevo_estado(carpeta)
+
+@st.fragment(run_every=vivo.INTERVALO_SEG)
+def vigilar_carpeta(estado, version, ahora):
+    # Revisa la carpeta sin volver a correr la página: solo la recarga si hay datos nuevos o avanzó "ahora"
+    if vivo.sincronizar(estado) or estado["version"] != version or pd.Timestamp.now().floor(kpi.RESOLUCION_AHORA) != ahora:
+        st.rerun()
+    st.caption(f"🔴 En vivo · revisado a las {pd.Timestamp.now():%H:%M:%S}")
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def registrar_historico(_df_master, id_dataset, rotacion, _ahora):
+    # Una foto por dataset y rotación, con los minutos del primer cálculo. La registran la
+    # página, la precarga y el modo en vivo: la que llega primero la escribe
+    return historico.registrar(pipeline.kpis_rotacion(_df_master, rotacion, _ahora))
 
-    df_maestro['TIPO_CONTENEDOR'] = df_maestro.apply(es_reefer_ct, axis=1)
-
-    try:
-        df_guardar = df_maestro.reset_index()
-        df_guardar.to_excel(ARCHIVO_MAESTRO, index=False)
-        return df_guardar
-    except Exception as e:
-        # En Streamlit Cloud a veces no deja guardar, pero retornamos el DF igual
-        return df_maestro.reset_index()
-
-@st.cache_data(show_spinner="Procesando datos...")
-def procesar_datos_completos(files_rep_list, files_mon_list):
-    lista_dfs = []
-    for archivo_rep in files_rep_list:
-        meta = extraer_metadatos(archivo_rep)
-        df_ind = cargar_excel(archivo_rep, "CONTENEDOR")
-        if df_ind is not None:
-            df_ind = df_ind[df_ind['CONTENEDOR'].notna()]
-            df_ind = df_ind[df_ind['CONTENEDOR'].astype(str).str.strip() != ""]
-            df_ind = df_ind[~df_ind['CONTENEDOR'].astype(str).str.contains("Total", case=False, na=False)]
-            df_ind['ROTACION_DETECTADA'] = meta['Rotación']
-            df_ind['NAVE_DETECTADA'] = meta['Nave']
-            df_ind['FECHA_CONSULTA'] = meta['Fecha']
-            lista_dfs.append(df_ind)
-            
-    if not lista_dfs: return None
-    df_rep = pd.concat(lista_dfs, ignore_index=True)
-    
-    df_mon_data = procesar_batch_monitores(files_mon_list)
-    if df_mon_data is None: 
-        st.warning("No se pudo procesar ningún archivo monitor válido.")
-        return None
-    
-    df_master = pd.merge(df_rep, df_mon_data, left_on="CONTENEDOR", right_on="UNIDAD", how="left")
-    
-    if 'TIPO_CONTENEDOR' in df_master.columns:
-        df_master['TIPO'] = df_master['TIPO_CONTENEDOR'].fillna('General')
-    else:
-        df_master['TIPO'] = 'General'
-        
-    cols_fecha_posibles = ["TIME_IN", "CONEXIÓN", "SOLICITUD DESCONEXIÓN", "DESCONECCIÓN", "TIME_LOAD", "CONEXIÓN ONBOARD"]
-    for col in cols_fecha_posibles:
-        if col in df_master.columns:
-            df_master[col] = pd.to_datetime(df_master[col], dayfirst=True, errors='coerce')
-    return df_master
+@st.cache_data(show_spinner=False)
+def cargar_historico(version):
+    # La versión sube con cada registro: entre registros no se vuelve a leer la base
+    return historico.cargar()
+
+def minutos_percentil(valor):
+    if pd.isna(valor): return "—"
+    return f"≥{historico.TOPE_HISTOGRAMA}" if valor >= historico.TOPE_HISTOGRAMA else f"{int(valor)}"
+
+def mostrar_historico():
+    st.title("📈 Histórico de Cumplimiento")
+    with diagnostico.etapa("historico") as m:
+        _, resumen, histograma = cargar_historico(historico.version())
+        m["filas_salida"] = len(resumen)
+    if resumen.empty:
+        st.info("Aún no hay rotaciones registradas: cada rotación que se abre en el dashboard o procesa el modo batch queda guardada aquí.")
+        return
+
+    f1, f2, f3, f4 = st.columns([2, 1, 2, 2])
+    proceso = f1.selectbox("Proceso", list(kpi.PAREJAS))
+    periodo = f2.selectbox("Agrupar por", list(historico.PERIODOS), index=2)
+    naves = f3.multiselect("Naves", sorted(resumen['NAVE'].unique()), placeholder="Todas")
+    dia_min, dia_max = resumen['DIA'].min().date(), resumen['DIA'].max().date()
+    rango = f4.date_input("Período", (dia_min, dia_max), min_value=dia_min, max_value=dia_max)
+    # Mientras se elige el rango llega una sola fecha; si se borra, ninguna
+    desde, hasta = rango if len(rango) == 2 else (rango[0], dia_max) if rango else (dia_min, dia_max)
+
+    def filtrar(tabla):
+        sel = (tabla['PROCESO'] == proceso) & tabla['DIA'].between(pd.Timestamp(desde), pd.Timestamp(hasta))
+        if naves: sel &= tabla['NAVE'].isin(naves)
+        return historico.con_periodo(tabla[sel], periodo)
+    res, his = filtrar(resumen), filtrar(histograma)
+    if res.empty:
+        st.info("No hay datos para ese filtro.")
+        return
+
+    # Todo sale de los resúmenes precalculados: sumas e histogramas, sin leer el detalle
+    total = historico.agregar(res, ["PROCESO"]).iloc[0]
+    perc = historico.percentiles(his, ["PROCESO"])
+    k1, k2, k3, k4, k5 = st.columns(5)
+    k1.metric("Rotaciones", res['ROTACION_LABEL'].nunique())
+    k2.metric("Contenedores", int(total["ACTIVOS"]))
+    k3.metric("Cumplimiento", f"{total['PCT_CUMPLE']:.1f}%")
+    k4.metric("Promedio", f"{total['PROM_MINUTOS']:.1f} min")
+    k5.metric("P50 / P90", "—" if perc.empty else f"{minutos_percentil(perc['P50'].iloc[0])} / {minutos_percentil(perc['P90'].iloc[0])} min")
+
+    import plotly.express as px  # Diferido: solo esta vista usa plotly.express
+
+    g1, g2 = st.columns(2)
+    with g1:
+        st.subheader("🕜 Cumplimiento")
+        por_periodo = historico.agregar(res, ["PERIODO", "TIPO"])
+        fig = px.line(por_periodo, x="PERIODO", y="PCT_CUMPLE", color="TIPO", markers=True,
+                      color_discrete_map={"CT": "#003366", "General": "#7fb3d5"}, labels={"PCT_CUMPLE": "% Cumple", "PERIODO": ""})
+        fig.update_layout(height=300, yaxis_range=[0, 100], margin=dict(t=20, b=20, l=20, r=20), legend=dict(orientation="h", y=-0.2))
+        st.plotly_chart(fig, use_container_width=True, key="hist_cumple")
+    with g2:
+        st.subheader("⏱️ Minutos (P50 / P90)")
+        perc_periodo = historico.percentiles(his, ["PERIODO"]).melt(id_vars="PERIODO", value_vars=["P50", "P90"], var_name="Percentil", value_name="Minutos")
+        fig = px.line(perc_periodo, x="PERIODO", y="Minutos", color="Percentil", markers=True,
+                      color_discrete_map={"P50": "#2ecc71", "P90": "#dc3545"}, labels={"PERIODO": ""})
+        fig.update_layout(height=300, margin=dict(t=20, b=20, l=20, r=20), legend=dict(orientation="h", y=-0.2))
+        st.plotly_chart(fig, use_container_width=True, key="hist_minutos")
+
+    st.subheader("🚢 Por Rotación")
+    por_rot = historico.agregar(res, ["NAVE", "ROTACION_LABEL"]).merge(historico.percentiles(his, ["ROTACION_LABEL"]), on="ROTACION_LABEL", how="left")
+    por_rot["DESDE"] = por_rot["ROTACION_LABEL"].map(res.groupby("ROTACION_LABEL")["DIA"].min())
+    por_rot = por_rot.sort_values("DESDE", ascending=False)
+    tabla = pd.DataFrame({
+        "Nave": por_rot["NAVE"], "Rotación": por_rot["ROTACION_LABEL"], "Desde": por_rot["DESDE"].dt.date,
+        "Contenedores": por_rot["ACTIVOS"], "% Cumple": por_rot["PCT_CUMPLE"].round(1),
+        "Prom. min": por_rot["PROM_MINUTOS"].round(1), "P90 min": por_rot["P90"].map(minutos_percentil),
+        "🔴 Rojos": por_rot["ROJOS"],
+    })
+    st.dataframe(tabla, use_container_width=True, hide_index=True)
+
+def avisar(avisos):
+    for nivel, mensaje in avisos:
+        getattr(st, nivel)(mensaje)
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def kpis_rotacion(_df_master, id_dataset, rotacion, ahora):
+    # _df_master no se hashea: la clave es (id_dataset, rotación, ahora)
+    return pipeline.kpis_rotacion(_df_master, rotacion, ahora)
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def indice_busqueda(_df, id_dataset, rotacion):
+    # El orden de filas de una rotación no depende de "ahora": un índice por dataset y rotación
+    return busqueda.indexar(_df['CONTENEDOR'])
 
 # --- INTERFAZ DE USUARIO ---
 with st.sidebar:
     c1, c2, c3 = st.columns([1, 4, 1]) 
     with c2:
-        try: st.image("Logo.png", use_container_width=True)
-        except: st.title("SITRANS")
+        if logo_app: st.image(logo_app, use_container_width=True)
+        else: st.title("SITRANS")
         
+    vista = st.radio("Vista", ["📊 Operación", "📈 Histórico"], horizontal=True, label_visibility="collapsed")
+
     st.header("Carga de Datos")
     files_rep_list = st.file_uploader("📂 1_Reportes", type=["xls", "xlsx"], accept_multiple_files=True)
     files_mon_list = st.file_uploader("📂 2_Monitor (Múltiples)", type=["xlsx"], accept_multiple_files=True)
+
+    modo_vivo = st.toggle("🔴 Modo en vivo", help=f"En vez de subir archivos, vigila <carpeta>/{vivo.SUBCARPETA_REPORTES} y <carpeta>/{vivo.SUBCARPETA_MONITORES} e integra solo lo nuevo.")
+    if modo_vivo: carpeta_vivo = st.text_input("📁 Carpeta vigilada", value="entrada")
     
+    if os.path.exists(almacen.ARCHIVO_MAESTRO):
+        st.download_button(
+            label="📥 Descargar Historial Monitor",
+            data=almacen.exportar_maestro_excel,
+            file_name=almacen.ARCHIVO_MAESTRO_XLSX,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+
     if st.button("Borrar Historial Monitor"):
-        if os.path.exists(ARCHIVO_MAESTRO):
-            os.remove(ARCHIVO_MAESTRO)
+        # Lo ya integrado o calculado dependía del historial borrado
+        _, trabajos, lock = _ingestas()
+        with lock:
+            for trabajo in trabajos.values(): trabajo["cancelar"].set()
+            trabajos.clear()
+        procesar_rotacion.clear()
+        # La versión del maestro nuevo vuelve a empezar: lo ya precargado no vale
+        _precarga()[1].clear()
+        # El modo en vivo vuelve a integrar la carpeta completa en el maestro nuevo
+        estado_vivo.clear()
+        if almacen.borrar_historial():
             st.success("Historial borrado.")
         else: st.info("No hay historial.")
 
-# --- LÓGICA PRINCIPAL ---
-if files_rep_list and files_mon_list:
-    df_master = procesar_datos_completos(files_rep_list, files_mon_list)
-
-    if df_master is not None:
-        # --- CREAR ETIQUETA COMBINADA (ROTACIÓN - NAVE) ---
-        df_master['ROTACION_LABEL'] = df_master['ROTACION_DETECTADA'].astype(str) + " - " + df_master['NAVE_DETECTADA'].astype(str)
+    # Perfila solo la ejecución disparada por este botón
+    perfilar = st.button("🧪 Perfilar esta ejecución", help="cProfile + tracemalloc sobre una sola ejecución; el resultado queda en Diagnóstico.")
 
-        c_head_izq, c_head_der = st.columns([3, 1])
-        
-        # Filtro de Rotación
-        opciones_rot = df_master['ROTACION_LABEL'].unique()
-        with c_head_der:
-            seleccion_label = st.selectbox("⚓ Rotación:", opciones_rot)
-
-        # Filtrar DataFrame principal
-        df = df_master[df_master['ROTACION_LABEL'] == seleccion_label].copy()
-        
-        # Obtener metadatos para el header
-        nave = df['NAVE_DETECTADA'].iloc[0] if not df.empty else "---"
-        rotacion_real = df['ROTACION_DETECTADA'].iloc[0] if not df.empty else "---"
-        fecha = df['FECHA_CONSULTA'].iloc[0] if not df.empty else "---"
-
-        with c_head_izq:
-            st.title("🚢 Control de Operaciones Sitrans")
-            
-        st.markdown(f"""
-        <div class="header-data-box">
-            <div class="header-item"><div class="header-label">Nave</div><div class="header-value">{nave}</div></div>
-            <div class="header-item"><div class="header-label">Fecha Consulta</div><div class="header-value">{fecha}</div></div>
-            <div class="header-item"><div class="header-label">Rotación</div><div class="header-value">{rotacion_real}</div></div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        parejas = {
-            "Conexión a Stacking": {"Fin": "CONEXIÓN", "Ini": "TIME_IN"},
-            "Desconexión para Embarque": {"Fin": "DESCONECCIÓN", "Ini": "SOLICITUD DESCONEXIÓN"},
-            "Conexión OnBoard": {"Fin": "CONEXIÓN ONBOARD", "Ini": "TIME_LOAD"}
-        }
-
-        mapa_estados = {
-            "Conexión a Stacking": "Conectado",
-            "Desconexión para Embarque": "Desconectado",
-            "Conexión OnBoard": "Conectado a Bordo"
-        }
-
-        ahora = pd.Timestamp.now()
+# --- LÓGICA PRINCIPAL ---
+mediciones_ingesta, seleccion_label, id_dataset = [], None, None
+perfil_ctx = diagnostico.perfilar() if perfilar else contextlib.nullcontext()
+with diagnostico.capturar() as mediciones_rerun, perfil_ctx as perfil:
+    ahora = pd.Timestamp.now().floor(kpi.RESOLUCION_AHORA)
+    if modo_vivo: estado = estado_vivo(carpeta_vivo)
+
+    if vista == "📈 Histórico": mostrar_historico()
+    elif modo_vivo or (files_rep_list and files_mon_list):
+        df_master, en_curso = None, False
+        with st.spinner("Procesando datos..."):
+            if modo_vivo:
+                # Solo se integra lo que no se había visto; sin cambios no se parsea nada
+                vivo.sincronizar(estado)
+                indice, avisos = vivo.indice(estado), estado["avisos"]
+            else:
+                contenidos_rep = tuple((f.name, f.getvalue()) for f in files_rep_list)
+                contenidos_mon = tuple((f.name, f.getvalue()) for f in files_mon_list)
+                # El selector de rotación sale solo de los metadatos; los monitores se integran
+                # en segundo plano y mientras tanto se muestra lo que ya está en el maestro
+                (indice, avisos), med_indice = indexar_rotaciones(contenidos_rep)
+                clave_ingesta, trabajo = ingesta_monitores(contenidos_mon)
+                en_curso = not trabajo["futuro"].done()
+                version = almacen.version_maestro()
+                if not en_curso:
+                    avisos = avisos + trabajo["avisos"]
+                    if trabajo["futuro"].exception(): avisos.append(("error", f"Error integrando monitores: {trabajo['futuro'].exception()}"))
+            avisar(avisos)
+
+            if indice:
+                c_head_izq, c_head_der = st.columns([3, 1])
+                
+                # Filtro de Rotación
+                with c_head_der:
+                    seleccion_label = st.selectbox("⚓ Rotación:", list(indice))
 
-        # --- CÁLCULO DE ESTADOS Y KPI ---
-        for proceso, cols in parejas.items():
-            label_fin = mapa_estados[proceso]
-            df[f"Estado_{proceso}"] = "Sin Solicitud"
-            df[f"Min_{proceso}"] = 0.0
+                # Solo se parsea y cruza la rotación elegida
+                if modo_vivo: df_master, avisos = vivo.rotacion(estado, seleccion_label)
+                else:
+                    seleccion = tuple(contenidos_rep[i] for i in indice[seleccion_label])
+                    (df_master, avisos), med_rotacion = procesar_rotacion(seleccion, version, en_curso)
+                    mediciones_ingesta = med_indice + trabajo["mediciones"] + med_rotacion
+                avisar(avisos)
+
+        if en_curso: progreso_ingesta(trabajo, version)
+        elif not modo_vivo and trabajo["cancelar"].is_set():
+            c_aviso, c_boton = st.columns([5, 1], vertical_alignment="center")
+            integrados = sum(p["estado"] == "Integrado" for p in trabajo["progreso"])
+            c_aviso.warning(f"Ingesta cancelada: {integrados} de {len(trabajo['progreso'])} monitores integrados.")
+            if c_boton.button("▶️ Reanudar", use_container_width=True):
+                # Lo ya integrado se vuelve a aplicar igual (upsert) y sale de la caché de parseo
+                _ingestas()[1].pop(clave_ingesta, None)
+                st.rerun()
+
+        if df_master is not None:
+            if modo_vivo: precargar_vivo(estado, seleccion_label, ahora)
+            elif not en_curso: precargar_rotaciones(contenidos_rep, indice, seleccion_label, version, ahora)
+
+            # Actualizar los "Pendiente" a la hora actual
+            id_dataset = df_master.attrs.get('id_dataset')
+            df = kpis_rotacion(df_master, id_dataset, seleccion_label, ahora)
+            if not en_curso: registrar_historico(df_master, id_dataset, seleccion_label, ahora)
             
-            if cols["Ini"] in df.columns and cols["Fin"] in df.columns:
-                cond = [
-                    (df[cols["Ini"]].notna()) & (df[cols["Fin"]].notna()), 
-                    (df[cols["Ini"]].notna()) & (df[cols["Fin"]].isna()),  
-                    (df[cols["Ini"]].isna())                             
-                ]
-                df[f"Estado_{proceso}"] = np.select(cond, [label_fin, "Pendiente", "Sin Solicitud"], default="Sin Solicitud")
-                
-                col_min = f"Min_{proceso}"
-                mask_fin = df[f"Estado_{proceso}"] == label_fin
-                
-                diff_minutos = (df.loc[mask_fin, cols["Fin"]] - df.loc[mask_fin, cols["Ini"]]).dt.total_seconds() / 60
-                df.loc[mask_fin, col_min] = diff_minutos.clip(lower=0) 
+            # Obtener metadatos para el header
+            nave = df['NAVE_DETECTADA'].iloc[0] if not df.empty else "---"
+            rotacion_real = df['ROTACION_DETECTADA'].iloc[0] if not df.empty else "---"
+            fecha = df['FECHA_CONSULTA'].iloc[0] if not df.empty else "---"
 
-                mask_pen = df[f"Estado_{proceso}"] == "Pendiente"
-                diff_pendiente = (ahora - df.loc[mask_pen, cols["Ini"]]).dt.total_seconds() / 60
-                df.loc[mask_pen, col_min] = diff_pendiente.clip(lower=0)
+            with c_head_izq:
+                st.title("🚢 Control de Operaciones Sitrans")
                 
-                df[f"Ver_Tiempo_{proceso}"] = np.where(mask_fin, df[col_min].apply(formatear_duracion), "")
-                df[f"Ver_Trans_{proceso}"] = np.where(mask_pen, df[col_min], 0)
-
-            col_min_p = f"Min_{proceso}"
-            limite_verde, limite_amarillo = UMBRALES_SEMAFORO[proceso]
-            cond_sem = [
-                df[col_min_p] <= limite_verde,
-                (df[col_min_p] > limite_verde) & (df[col_min_p] <= limite_amarillo),
-                df[col_min_p] > limite_amarillo
-            ]
-            df[f"Semaforo_{proceso}"] = np.select(cond_sem, ['Verde', 'Amarillo', 'Rojo'], default='Rojo')
+            st.markdown(f"""
+            <div class="header-data-box">
+                <div class="header-item"><div class="header-label">Nave</div><div class="header-value">{nave}</div></div>
+                <div class="header-item"><div class="header-label">Fecha Consulta</div><div class="header-value">{fecha}</div></div>
+                <div class="header-item"><div class="header-label">Rotación</div><div class="header-value">{rotacion_real}</div></div>
+            </div>
+            """, unsafe_allow_html=True)
+            
+            # --- BÚSQUEDA (una vez para las tres pestañas) ---
+            c_busq, c_lote = st.columns([4, 1], vertical_alignment="bottom")
+            termino = c_busq.text_input("🔍 Buscar Contenedor:", placeholder="Ej: TRHU o 123...", label_visibility="collapsed")
+            with c_lote.popover("📋 Buscar lista", use_container_width=True):
+                lista = st.text_area("Contenedores (uno por línea, o separados por espacio o coma)", height=200)
+
+            mascara_busqueda, faltantes = None, []
+            if termino.strip() or lista.strip():
+                with diagnostico.etapa("busqueda", len(df)) as m:
+                    indice_cont = indice_busqueda(df, id_dataset, seleccion_label)
+                    filas = busqueda.buscar(indice_cont, termino)
+                    if lista.strip():
+                        filas_lista, faltantes = busqueda.buscar_lote(indice_cont, lista)
+                        filas = np.intersect1d(filas, filas_lista, assume_unique=True)
+                    mascara_busqueda = np.zeros(len(df), dtype=bool)
+                    mascara_busqueda[filas] = True
+                    m["filas_salida"] = len(filas)
+            if faltantes:
+                st.caption(f"No encontrados en esta rotación ({len(faltantes)}): " + ", ".join(faltantes))
+
+            # --- TABS VISUALIZACIÓN ---
+            tab1, tab2, tab3 = st.tabs(["🔌 CONEXIÓN A STACKING", "🔋 DESCONEXIÓN EMBARQUE", "🚢 CONEXIÓN ONBOARD"])
+
+            def render_tab(tab, proceso):
+                with tab:
+                    st.write("") 
+                    col_stat = f"Estado_{proceso}"
+                    label_fin = kpi.MAPA_ESTADOS[proceso]
+                    lim_verde, lim_amarillo = kpi.UMBRALES_SEMAFORO[proceso]
+
+                    with diagnostico.etapa(f"resumen · {proceso}", len(df)):
+                        resumen = kpi.resumen_proceso(df, proceso)
+                    
+                    if resumen is not None:
+                        # --- CONFIGURACIÓN DE LEYENDA ORDENADA ---
+                        conteos = resumen["conteos"].reset_index()
+                        conteos.columns = ['Color', 'Cantidad']
+                        
+                        label_verde = f"Verde: ≤{lim_verde}m"
+                        label_amarillo = f"Amarillo: {lim_verde}-{lim_amarillo}m"
+                        label_rojo = f"Rojo: >{lim_amarillo}m"
+
+                        legend_map = {
+                            'Verde': label_verde,
+                            'Amarillo': label_amarillo,
+                            'Rojo': label_rojo
+                        }
+                        conteos['Color'] = conteos['Color'].map(legend_map)
+                        
+                        # Forzar orden de categorías
+                        orden_fijo = [label_verde, label_amarillo, label_rojo]
+                        conteos['Color'] = pd.Categorical(conteos['Color'], categories=orden_fijo, ordered=True)
+                        conteos = conteos.sort_values('Color')
+
+                        new_color_map = {
+                            label_verde: '#2ecc71',
+                            label_amarillo: '#ffc107',
+                            label_rojo: '#dc3545'
+                        }
+
+                        pct = resumen["pct"]
+
+                        k1, k2, k3 = st.columns([1, 1, 1], gap="medium")
+
+                        with k1: 
+                            st.subheader("🚦 Distribución")
+                            fig = figura("torta", labels=conteos['Color'].astype(str).tolist(), values=conteos['Cantidad'].tolist(),
+                                         marker={'colors': [new_color_map[c] for c in conteos['Color']]})
+                            st.plotly_chart(fig, use_container_width=True, key=f"pie_{proceso}")
+
+                        with k2:
+                            st.subheader("🕜 Cumplimiento")
+                            color_texto = "#28a745" if pct >= 66.6 else "#ffc107" if pct >= 33.3 else "#dc3545"
+                            fig_gauge = figura("indicador", value=pct, number={'font': {'color': color_texto}})
+                            st.plotly_chart(fig_gauge, use_container_width=True, key=f"gauge_{proceso}")
+
+                        with k3:
+                            st.subheader("📊 Métricas")
+                            if proceso == "Conexión OnBoard":
+                                prom_global = resumen["prom_global"]
+                                rojos_total = resumen["rojos_total"]
+                                if rojos_total > 0: st.markdown(f"""<div class="alert-box alert-red">🚨 {rojos_total} Fuera de Plazo</div>""", unsafe_allow_html=True)
+                                else: st.markdown(f"""<div class="alert-box alert-green">✅ Todo al día</div>""", unsafe_allow_html=True)
+                                st.markdown(f"""<div class="metric-card"><div class="metric-val">{prom_global:.1f} min</div><div class="metric-lbl">Promedio Total</div></div>""", unsafe_allow_html=True)
+                            else:
+                                rojos_ct = resumen["rojos_ct"]
+                                prom_c = resumen["prom_ct"]
+                                prom_g = resumen["prom_gen"]
+
+                                if rojos_ct > 0: st.markdown(f"""<div class="alert-box alert-red">🚨 {rojos_ct} CT Fuera Plazo</div>""", unsafe_allow_html=True)
+                                else: st.markdown(f"""<div class="alert-box alert-green">✅ CT al día</div>""", unsafe_allow_html=True)
+                                
+                                p1, p2 = st.columns(2)
+                                with p1: st.markdown(f"""<div class="metric-card"><div class="metric-val">{prom_g:.1f} m</div><div class="metric-lbl">Prom. Gen</div></div>""", unsafe_allow_html=True)
+                                with p2: st.markdown(f"""<div class="metric-card"><div class="metric-val">{prom_c:.1f} m</div><div class="metric-lbl">Prom. CT</div></div>""", unsafe_allow_html=True)
 
-        # --- TABS VISUALIZACIÓN ---
-        tab1, tab2, tab3 = st.tabs(["🔌 CONEXIÓN A STACKING", "🔋 DESCONEXIÓN EMBARQUE", "🚢 CONEXIÓN ONBOARD"])
+                    else:
+                        st.info(f"ℹ️ No hay actividad activa para {proceso}.")
 
-        def render_tab(tab, proceso):
-            with tab:
-                st.write("") 
-                col_stat = f"Estado_{proceso}"
-                col_min = f"Min_{proceso}"
-                col_sem = f"Semaforo_{proceso}"
-                label_fin = mapa_estados[proceso]
-                lim_verde, lim_amarillo = UMBRALES_SEMAFORO[proceso]
+                    st.divider()
 
-                df_activo = df[df[col_stat].isin([label_fin, "Pendiente"])].copy()
-                
-                conteos = pd.DataFrame()
-                if not df_activo.empty:
-                    # --- CONFIGURACIÓN DE LEYENDA ORDENADA ---
-                    conteos = df_activo[col_sem].value_counts().reset_index()
-                    conteos.columns = ['Color', 'Cantidad']
+                    c_filt, c_tot, c_norm, c_ct = st.columns([2, 1, 1, 1], gap="small")
                     
-                    label_verde = f"Verde: ≤{lim_verde}m"
-                    label_amarillo = f"Amarillo: {lim_verde}-{lim_amarillo}m"
-                    label_rojo = f"Rojo: >{lim_amarillo}m"
-
-                    legend_map = {
-                        'Verde': label_verde,
-                        'Amarillo': label_amarillo,
-                        'Rojo': label_rojo
-                    }
-                    conteos['Color'] = conteos['Color'].map(legend_map)
+                    with c_filt:
+                        filtro_estado = st.radio(f"f_{proceso}", ["Todos", label_fin, "Pendiente", "Sin Solicitud"], horizontal=True, label_visibility="collapsed", key=proceso)
                     
-                    # Forzar orden de categorías
-                    orden_fijo = [label_verde, label_amarillo, label_rojo]
-                    conteos['Color'] = pd.Categorical(conteos['Color'], categories=orden_fijo, ordered=True)
-                    conteos = conteos.sort_values('Color')
-
-                    new_color_map = {
-                        label_verde: '#2ecc71',
-                        label_amarillo: '#ffc107',
-                        label_rojo: '#dc3545'
-                    }
-
-                if not df_activo.empty:
-                    if proceso == "Conexión OnBoard": 
-                        df_activo['Cumple'] = df_activo[col_min] <= 30
-                    else:
-                        cond_cumple = [
-                            (df_activo['TIPO'] == 'CT') & (df_activo[col_min] <= 30),
-                            (df_activo['TIPO'] == 'General') & (df_activo[col_min] <= 60)
-                        ]
-                        df_activo['Cumple'] = np.select(cond_cumple, [True, True], default=False)
+                    with diagnostico.etapa(f"filtro · {proceso}", len(df)) as m:
+                        # Máscara sobre df: la grilla solo lee, no hace falta copiar
+                        mascara = np.ones(len(df), dtype=bool) if filtro_estado == "Todos" else (df[col_stat] == filtro_estado).to_numpy()
+                        if mascara_busqueda is not None: mascara &= mascara_busqueda
+                        df_show = df if mascara.all() else df[mascara]
+                        m["filas_salida"] = len(df_show)
+
+                    c_tot.metric("Total Contenedores", len(df_show))
+                    c_norm.metric("❄️ Normales", int((df_show['TIPO'] == 'General').sum()))
+                    c_ct.metric("⚡ CT (Reefers)", int((df_show['TIPO'] == 'CT').sum()))
                     
-                    pct = (df_activo['Cumple'].sum() / len(df_activo)) * 100
-
-                    k1, k2, k3 = st.columns([1, 1, 1], gap="medium")
-
-                    with k1: 
-                        st.subheader("🚦 Distribución")
-                        fig = px.pie(conteos, values='Cantidad', names='Color', 
-                                     color='Color', color_discrete_map=new_color_map, hole=0.6)
-                        fig.update_layout(showlegend=True, margin=dict(t=20,b=20,l=20,r=20), height=230, legend=dict(orientation="h", y=-0.2))
-                        st.plotly_chart(fig, use_container_width=True, key=f"pie_{proceso}")
-
-                    with k2:
-                        st.subheader("🕜 Cumplimiento")
-                        color_texto = "#28a745" if pct >= 66.6 else "#ffc107" if pct >= 33.3 else "#dc3545"
-                        fig_gauge = go.Figure(go.Indicator(
-                            mode = "gauge+number",
-                            value = pct,
-                            number = {
-                                'suffix': "%", 
-                                'valueformat': ".1f",
-                                'font': {'size': 38, 'weight': 'bold', 'color': color_texto}
-                            },
-                            gauge = {
-                                'axis': {'range': [0, 100]},
-                                'bar': {'color': "rgba(0,0,0,0)"},
-                                'steps': [
-                                    {'range': [0, 33.33], 'color': "#dc3545"},
-                                    {'range': [33.33, 66.66], 'color': "#ffc107"},
-                                    {'range': [66.66, 100], 'color': "#28a745"}
-                                ]
-                            }
-                        ))
-                        fig_gauge.update_layout(height=230, margin=dict(t=20, b=20, l=45, r=45))
-                        st.plotly_chart(fig_gauge, use_container_width=True, key=f"gauge_{proceso}")
-
-                    with k3:
-                        st.subheader("📊 Métricas")
-                        if proceso == "Conexión OnBoard":
-                            prom_global = df_activo[col_min].mean()
-                            rojos_total = len(df_activo[~df_activo['Cumple']])
-                            if rojos_total > 0: st.markdown(f"""<div class="alert-box alert-red">🚨 {rojos_total} Fuera de Plazo</div>""", unsafe_allow_html=True)
-                            else: st.markdown(f"""<div class="alert-box alert-green">✅ Todo al día</div>""", unsafe_allow_html=True)
-                            st.markdown(f"""<div class="metric-card"><div class="metric-val">{prom_global:.1f} min</div><div class="metric-lbl">Promedio Total</div></div>""", unsafe_allow_html=True)
-                        else:
-                            rojos_ct = len(df_activo[(df_activo['TIPO']=='CT') & (~df_activo['Cumple'])])
-                            prom_c = df_activo[df_activo['TIPO']=='CT'][col_min].mean()
-                            prom_g = df_activo[df_activo['TIPO']=='General'][col_min].mean()
-
-                            if rojos_ct > 0: st.markdown(f"""<div class="alert-box alert-red">🚨 {rojos_ct} CT Fuera Plazo</div>""", unsafe_allow_html=True)
-                            else: st.markdown(f"""<div class="alert-box alert-green">✅ CT al día</div>""", unsafe_allow_html=True)
-                            
-                            p1, p2 = st.columns(2)
-                            with p1: st.markdown(f"""<div class="metric-card"><div class="metric-val">{prom_g:.1f} m</div><div class="metric-lbl">Prom. Gen</div></div>""", unsafe_allow_html=True)
-                            with p2: st.markdown(f"""<div class="metric-card"><div class="metric-val">{prom_c:.1f} m</div><div class="metric-lbl">Prom. CT</div></div>""", unsafe_allow_html=True)
-
-                else:
-                    st.info(f"ℹ️ No hay actividad activa para {proceso}.")
-
-                st.divider()
-
-                c_filt, c_tot, c_norm, c_ct = st.columns([2, 1, 1, 1], gap="small")
-                
-                with c_filt:
-                    filtro_estado = st.radio(f"f_{proceso}", ["Todos", label_fin, "Pendiente", "Sin Solicitud"], horizontal=True, label_visibility="collapsed", key=proceso)
-                
-                if filtro_estado == "Todos": df_show = df.copy()
-                else: df_show = df[df[col_stat] == filtro_estado].copy()
-                
-                busqueda = st.text_input(f"🔍 Buscar Contenedor:", placeholder="Ej: TRHU o 123...", key=f"search_{proceso}", label_visibility="collapsed")
-                
-                if busqueda:
-                    termino = busqueda.strip()
-                    df_show = df_show[df_show['CONTENEDOR'].astype(str).str.contains(termino, case=False, na=False)]
-
-                c_tot.metric("Total Contenedores", len(df_show))
-                c_norm.metric("❄️ Normales", len(df_show[df_show['TIPO'] == 'General']))
-                c_ct.metric("⚡ CT (Reefers)", len(df_show[df_show['TIPO'] == 'CT']))
-                
-                st.write("")
-
-                def pintar(row):
-                    val = df.loc[row.name, col_min]
-                    stt = df.loc[row.name, col_stat]
-                    est = [''] * len(row)
-                    if stt in [label_fin, "Pendiente"] and pd.notna(val) and val >= 0:
-                        c = "#d4edda" if val <= lim_verde else "#fff3cd" if val <= lim_amarillo else "#f8d7da"
-                        est[4] = f"background-color: {c}; font-weight: bold; color: #333;"
-                        if stt == label_fin: est[2] = f"background-color: {c}; font-weight: bold; color: #333;"
-                    return est
-
-                cols_ver = ['CONTENEDOR', 'TIPO', f"Ver_Tiempo_{proceso}", col_stat, f"Ver_Trans_{proceso}"]
-                df_dsp = df_show[cols_ver].copy()
-                df_dsp.columns = ['Contenedor', 'Tipo', 'Tiempo', 'Estado', 'Minutos Transcurridos']
-                st.dataframe(df_dsp.style.apply(pintar, axis=1).format({"Minutos Transcurridos": "{:.1f}"}), use_container_width=True, height=400)
-
-        render_tab(tab1, "Conexión a Stacking")
-        render_tab(tab2, "Desconexión para Embarque")
-        render_tab(tab3, "Conexión OnBoard")
-
-        st.divider()
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False)
-        st.download_button(
-            label="📥 Descargar Excel Completo",
-            data=buffer.getvalue(),
-            file_name=f"Reporte_{rotacion_real}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-
+                    st.write("")
+
+                    # Paginación en servidor: solo se estiliza y envía la página visible
+                    total_filas = len(df_show)
+                    paginas = max(1, -(-total_filas // kpi.FILAS_POR_PAGINA))
+                    key_pag = f"pag_{proceso}"
+                    if st.session_state.get(key_pag, 1) > paginas: st.session_state[key_pag] = 1
+                    if paginas > 1:
+                        c_pag, c_info = st.columns([1, 4])
+                        pagina = c_pag.number_input("Página", min_value=1, max_value=paginas, step=1, key=key_pag, label_visibility="collapsed")
+                        c_info.caption(f"Página {pagina} de {paginas} · {total_filas} contenedores")
+                    else: pagina = 1
+                    df_pag = df_show.iloc[(pagina - 1) * kpi.FILAS_POR_PAGINA : pagina * kpi.FILAS_POR_PAGINA]
+
+                    # Colores precalculados en kpi: la tabla de estilos se arma por columnas, no por fila
+                    with diagnostico.etapa(f"grilla · {proceso}", len(df_pag)) as m:
+                        df_dsp, estilos = kpi.tabla_grilla(df_pag, proceso)
+                        st.dataframe(df_dsp.style.apply(lambda _: estilos, axis=None).format({"Minutos Transcurridos": "{:.1f}"}), use_container_width=True, height=400)
+                        m["filas_salida"] = len(df_dsp)
+
+            render_tab(tab1, "Conexión a Stacking")
+            render_tab(tab2, "Desconexión para Embarque")
+            render_tab(tab3, "Conexión OnBoard")
+
+            st.divider()
+            # El archivo se genera solo al hacer clic, no en cada rerun
+            c_formato, c_descarga = st.columns([3, 1], vertical_alignment="bottom")
+            formato = c_formato.radio("Formato de descarga", list(exportar.FORMATOS), horizontal=True)
+            _, extension, mime = exportar.FORMATOS[formato]
+            sufijo = "_procesos" if formato == "Excel por proceso" else ""
+            c_descarga.download_button(
+                label="📥 Descargar",
+                data=functools.partial(exportar.generar, formato, df),
+                file_name=f"Reporte_{rotacion_real}{sufijo}.{extension}",
+                mime=mime,
+                on_click="ignore"
+            )
+
+        elif modo_vivo and not (indice and vivo.hay_monitores(estado)):
+            st.info(f"Esperando reportes y monitores en {carpeta_vivo}/{vivo.SUBCARPETA_REPORTES} y {carpeta_vivo}/{vivo.SUBCARPETA_MONITORES}...")
+        else:
+            st.error("Error al procesar archivos. Revisa el formato del Monitor.")
     else:
-        st.error("Error al procesar archivos. Revisa el formato del Monitor.")
-else:
-    st.info("Sube los reportes y los archivos Monitor para comenzar.")
+        st.info("Sube los reportes y los archivos Monitor para comenzar.")
+
+if modo_vivo:
+    with st.sidebar: vigilar_carpeta(estado, estado["version"], ahora)
+
+# --- DIAGNÓSTICO ---
+if perfil: st.session_state["perfil"] = perfil
+
+with st.sidebar.expander("🩺 Diagnóstico"):
+    if mediciones_ingesta:
+        st.caption("Última ingesta (se recalcula solo al cambiar los archivos)")
+        st.dataframe(diagnostico.tabla(mediciones_ingesta), hide_index=True, use_container_width=True)
+    st.caption("Esta ejecución")
+    st.dataframe(diagnostico.tabla(mediciones_rerun), hide_index=True, use_container_width=True)
+
+    if st.checkbox("Guardar en log (JSONL)", key="log_diagnostico", help=f"Agrega las mediciones a {diagnostico.ARCHIVO_LOG}"):
+        contexto = {"rotacion": seleccion_label}
+        # La ingesta se anota una sola vez por conjunto de archivos, no en cada ejecución
+        if mediciones_ingesta and st.session_state.get("ingesta_anotada") != id_dataset:
+            diagnostico.anotar_jsonl(mediciones_ingesta, {**contexto, "fase": "ingesta"})
+            st.session_state["ingesta_anotada"] = id_dataset
+        diagnostico.anotar_jsonl(mediciones_rerun, {**contexto, "fase": "ejecucion"})
+
+    if "perfil" in st.session_state:
+        perfil = st.session_state["perfil"]
+        st.caption("Perfil (tiempo acumulado)")
+        st.code(perfil["resumen"], language=None)
+        st.caption("Memoria asignada por línea")
+        st.code(perfil["memoria"], language=None)
+        st.download_button("📥 Descargar perfil (.prof)", data=perfil["prof"], file_name="sitrans_perfil.prof",
+                           mime="application/octet-stream", on_click="ignore")
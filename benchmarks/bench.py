@@ -0,0 +1,209 @@
+"""Benchmark por etapa del pipeline sobre workbooks sintéticos (ver generar.py).
+
+Mide tiempo (mejor de N repeticiones) y pico de memoria (tracemalloc, una corrida
+extra) de cada etapa, para cada escenario contenedores x archivos:
+
+    python benchmarks/bench.py --contenedores 1000 10000 --archivos 1 10 --guardar base
+    python benchmarks/bench.py --contenedores 1000 10000 --archivos 1 10 --comparar base
+
+Con --comparar termina con código 1 si alguna etapa empeora más que --tolerancia.
+El pico de memoria de "parseo" solo cuenta el proceso principal (los workers del
+pool no se rastrean). Antes de los escenarios se mide el arranque en frío de
+app.py (escenario "arranque").
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(AQUI))
+sys.path.insert(0, AQUI)
+
+import pandas as pd
+
+from generar import generar_escenario
+from sitrans import exportar, ingesta, kpi, pipeline
+
+CARPETA_BASELINES = os.path.join(AQUI, "baselines")
+RUTA_APP = os.path.join(os.path.dirname(AQUI), "app.py")
+ETAPAS = ["app_en_frio", "parseo", "deteccion_encabezado", "merge_monitor", "clasificacion_reefer", "merge_maestro",
+          "fechas", "kpis", "estilos", "exportacion"]
+AHORA = pd.Timestamp("2025-03-05 20:00")  # Fijo para que los "Pendiente" sean comparables entre corridas
+
+def medir(funcion, repeticiones, preparar=None):
+    """Devuelve (resultado, {"seg", "pico_mb"}); `preparar` arma la entrada fuera de la medición."""
+    tiempos = []
+    for _ in range(repeticiones):
+        entrada = preparar() if preparar else None
+        gc.collect()
+        t0 = time.perf_counter()
+        resultado = funcion(entrada) if preparar else funcion()
+        tiempos.append(time.perf_counter() - t0)
+
+    entrada = preparar() if preparar else None
+    gc.collect()
+    tracemalloc.start()
+    funcion(entrada) if preparar else funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, {"seg": min(tiempos), "pico_mb": pico / 2**20}
+
+# Corre app.py una vez en un intérprete nuevo e imprime "segundos pico_bytes"
+_ARRANQUE = """
+import os, runpy, sys, time, tracemalloc
+sys.path.insert(0, os.path.dirname(sys.argv[2]))  # Como `streamlit run`
+if sys.argv[1] == "memoria": tracemalloc.start()
+t0 = time.perf_counter()
+runpy.run_path(sys.argv[2], run_name="__main__")
+seg = time.perf_counter() - t0
+print(seg, tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0)
+"""
+
+def medir_arranque(repeticiones):
+    """Primera ejecución de app.py sin archivos cargados (importaciones, estilos, logo y
+    pantalla inicial), en un proceso nuevo cada vez: lo que paga un contenedor recién levantado."""
+    def correr(modo):
+        with tempfile.TemporaryDirectory(prefix="sitrans_arranque_") as carpeta:
+            salida = subprocess.run([sys.executable, "-c", _ARRANQUE, modo, RUTA_APP], cwd=carpeta,
+                                    capture_output=True, text=True, check=True)
+        seg, pico = salida.stdout.split()[-2:]
+        return float(seg), int(pico)
+    tiempos = [correr("tiempo")[0] for _ in range(repeticiones)]
+    return {"app_en_frio": {"seg": min(tiempos), "pico_mb": correr("memoria")[1] / 2**20}}
+
+def correr_escenario(rutas_rep, rutas_mon, repeticiones):
+    etapas = {}
+
+    def parseo():
+        ingesta.CARPETA_CACHE = tempfile.mkdtemp(prefix="sitrans_cache_")  # Caché fría en cada corrida
+        try:
+            with ExitStack() as stack:
+                tareas = [(ingesta.cargar_reporte, stack.enter_context(open(r, "rb"))) for r in rutas_rep]
+                tareas += [(ingesta.leer_monitor, stack.enter_context(open(r, "rb"))) for r in rutas_mon]
+                return ingesta.parsear_en_paralelo(tareas)
+        finally: shutil.rmtree(ingesta.CARPETA_CACHE, ignore_errors=True)
+    resultados, etapas["parseo"] = medir(parseo, repeticiones)
+    res_rep, res_mon = resultados[:len(rutas_rep)], resultados[len(rutas_rep):]
+
+    filas = []
+    for r in rutas_rep:
+        with open(r, "rb") as f: filas.append(list(ingesta.iterar_filas_excel(f)))
+    _, etapas["deteccion_encabezado"] = medir(lambda: [ingesta.armar_reporte(f) for f in filas], repeticiones)
+
+    df_rep = pd.concat([pipeline.preparar_reporte(meta, df) for (meta, df), _ in res_rep], ignore_index=True)
+    dfs_mon = [(os.path.basename(r), df) for r, (df, _) in zip(rutas_mon, res_mon)]
+    carpeta_db = tempfile.mkdtemp(prefix="sitrans_db_")
+    try:
+        ruta_db = os.path.join(carpeta_db, "maestro.db")
+        def maestro_vacio():
+            if os.path.exists(ruta_db): os.remove(ruta_db)
+        (df_mon, _), etapas["merge_monitor"] = medir(
+            lambda _: pipeline.procesar_batch_monitores(dfs_mon, df_rep['CONTENEDOR'].unique(), ruta_db),
+            repeticiones, preparar=maestro_vacio)
+    finally: shutil.rmtree(carpeta_db, ignore_errors=True)
+
+    _, etapas["clasificacion_reefer"] = medir(lambda: ingesta.clasificar_reefer(df_mon), repeticiones)
+    df_master, etapas["merge_maestro"] = medir(lambda: pipeline.cruzar_con_monitor(df_rep, df_mon), repeticiones)
+    (df_master, _), etapas["fechas"] = medir(pipeline.convertir_fechas, repeticiones, preparar=df_master.copy)
+
+    def kpis():
+        df = df_master.copy()
+        df['ROTACION_LABEL'] = df['ROTACION_DETECTADA'].astype(str) + " - " + df['NAVE_DETECTADA'].astype(str)
+        df = kpi.calcular_estados(pipeline.compactar_tipos(df))
+        return [pipeline.kpis_rotacion(df, rot, AHORA) for rot in df['ROTACION_LABEL'].unique()]
+    rotaciones, etapas["kpis"] = medir(kpis, repeticiones)
+
+    def estilos():
+        for df_rot in rotaciones:
+            for proceso in kpi.PAREJAS:
+                df_dsp, css = kpi.tabla_grilla(df_rot.iloc[:kpi.FILAS_POR_PAGINA], proceso)
+                df_dsp.style.apply(lambda _: css, axis=None).format({"Minutos Transcurridos": "{:.1f}"}).to_html()
+    _, etapas["estilos"] = medir(estilos, repeticiones)
+
+    def exportacion():
+        for df_rot in rotaciones: exportar.excel(df_rot, io.BytesIO())
+    _, etapas["exportacion"] = medir(exportacion, repeticiones)
+    return etapas
+
+def comparar(resultados, baseline, tolerancia):
+    regresiones = []
+    for escenario, etapas in resultados.items():
+        for etapa, medida in etapas.items():
+            base = baseline.get("resultados", {}).get(escenario, {}).get(etapa)
+            if base is None: continue
+            medida["baseline_seg"] = base["seg"]
+            medida["ratio"] = medida["seg"] / base["seg"] if base["seg"] else float("inf")
+            # Diferencias de pocos ms son ruido, no regresión
+            if medida["seg"] > base["seg"] * (1 + tolerancia) and medida["seg"] - base["seg"] > 0.005:
+                regresiones.append(f"{escenario} / {etapa}: {base['seg']:.3f}s -> {medida['seg']:.3f}s")
+    return regresiones
+
+def imprimir(escenario, etapas):
+    print(f"\n== {escenario} ==")
+    print(f"{'etapa':<22}{'seg':>10}{'pico MB':>10}{'baseline':>10}{'ratio':>8}")
+    for etapa in ETAPAS:
+        if etapa not in etapas: continue
+        m = etapas[etapa]
+        base = f"{m['baseline_seg']:.3f}" if "baseline_seg" in m else "-"
+        ratio = f"{m['ratio']:.2f}" if "ratio" in m else "-"
+        print(f"{etapa:<22}{m['seg']:>10.3f}{m['pico_mb']:>10.1f}{base:>10}{ratio:>8}")
+
+def ruta_baseline(nombre):
+    return nombre if nombre.endswith(".json") else os.path.join(CARPETA_BASELINES, f"{nombre}.json")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por etapa del pipeline Sitrans.")
+    parser.add_argument("--contenedores", type=int, nargs="+", default=[1000])
+    parser.add_argument("--archivos", type=int, nargs="+", default=[1])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--datos", default=os.path.join(tempfile.gettempdir(), "sitrans_bench_datos"),
+                        help="Carpeta de los workbooks generados (se reutilizan entre corridas)")
+    parser.add_argument("--guardar", help="Nombre o ruta .json donde guardar el baseline")
+    parser.add_argument("--comparar", help="Nombre o ruta .json del baseline a comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Empeoramiento admitido (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    resultados = {"arranque": medir_arranque(args.repeticiones)}
+    for contenedores in args.contenedores:
+        for archivos in args.archivos:
+            escenario = f"{contenedores}x{archivos}"
+            carpeta = os.path.join(args.datos, escenario)
+            if not os.path.isdir(carpeta):
+                print(f"Generando {escenario}...", file=sys.stderr)
+                generar_escenario(carpeta, contenedores, archivos)
+            rutas_rep = sorted(os.path.join(carpeta, n) for n in os.listdir(carpeta) if n.startswith("reporte_"))
+            rutas_mon = sorted(os.path.join(carpeta, n) for n in os.listdir(carpeta) if n.startswith("monitor_"))
+            resultados[escenario] = correr_escenario(rutas_rep, rutas_mon, args.repeticiones)
+
+    regresiones = []
+    if args.comparar:
+        with open(ruta_baseline(args.comparar), encoding="utf-8") as f:
+            regresiones = comparar(resultados, json.load(f), args.tolerancia)
+
+    for escenario, etapas in resultados.items(): imprimir(escenario, etapas)
+
+    if args.guardar:
+        os.makedirs(CARPETA_BASELINES, exist_ok=True)
+        entorno = {"python": platform.python_version(), "pandas": pd.__version__,
+                   "cpu": platform.processor() or platform.machine(), "nucleos": os.cpu_count(),
+                   "fecha": pd.Timestamp.now().isoformat(timespec="seconds")}
+        with open(ruta_baseline(args.guardar), "w", encoding="utf-8") as f:
+            json.dump({"entorno": entorno, "resultados": resultados}, f, indent=2)
+
+    if regresiones:
+        print("\nRegresiones:", *regresiones, sep="\n  ", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
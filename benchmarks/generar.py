@@ -0,0 +1,103 @@
+"""Generador de workbooks sintéticos con la forma de los archivos Sitrans.
+
+Reportes: bloque de metadatos (Nave / Rotación / Fecha), encabezado CONTENEDOR en
+una fila variable, fechas mezcladas (datetime de Excel y texto dd/mm/aaaa) y fila
+"Total" al final. Monitores: encabezado en la fila 4, columnas SENSORn_TMP
+duplicadas y UNIDAD solapadas entre archivos.
+
+    python benchmarks/generar.py --contenedores 10000 --archivos 10 --salida /tmp/sitrans_bench
+"""
+import argparse
+import datetime as dt
+import os
+import random
+
+from openpyxl import Workbook
+
+COLUMNAS_REPORTE = ["CONTENEDOR", "TIPO ISO", "TIME_IN", "CONEXIÓN", "SOLICITUD DESCONEXIÓN",
+                    "DESCONECCIÓN", "TIME_LOAD", "CONEXIÓN ONBOARD", "UBICACIÓN"]
+COLUMNAS_MONITOR = ["UNIDAD", "ESTADO", "SETPOINT", "SENSOR1_TMP", "SENSOR2_TMP", "SENSOR3_TMP",
+                    "SENSOR4_TMP", "SENSOR1_TMP", "SENSOR2_TMP", "OPERADOR", "PATIO", "ALARMA"]
+PREFIJOS = ["TRHU", "SZLU", "CGMU", "MNBU", "TTNU", "SEGU"]
+
+def contenedor(i):
+    return f"{PREFIJOS[i % len(PREFIJOS)]}{i:07d}"
+
+def _fecha(t, como_texto):
+    if t is None: return None
+    return t.strftime("%d/%m/%Y %H:%M") if como_texto else t
+
+def generar_reporte(ruta, rotacion, nave, ids, fila_encabezado=None, semilla=0):
+    rnd = random.Random(semilla)
+    fila_encabezado = fila_encabezado or rnd.randint(6, 15)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte")
+    ws.append(["REPORTE DE REEFERS - SITRANS"])
+    ws.append(["Nave", nave])
+    ws.append([f"Rotación: {rotacion}"])
+    ws.append(["Fecha consulta", "05/03/2025 14:20"])
+    for _ in range(5, fila_encabezado): ws.append([None])
+    ws.append(COLUMNAS_REPORTE)
+
+    base = dt.datetime(2025, 3, 5, 6, 0)
+    for i in ids:
+        texto = rnd.random() < 0.3  # Parte de las fechas llegan como texto
+        t_in = base + dt.timedelta(minutes=rnd.randint(0, 720))
+        conexion = t_in + dt.timedelta(minutes=rnd.randint(1, 90)) if rnd.random() < 0.8 else None
+        solicitud = t_in + dt.timedelta(minutes=rnd.randint(100, 300)) if rnd.random() < 0.6 else None
+        desconexion = solicitud + dt.timedelta(minutes=rnd.randint(1, 80)) if solicitud and rnd.random() < 0.7 else None
+        carga = t_in + dt.timedelta(minutes=rnd.randint(300, 600)) if rnd.random() < 0.5 else None
+        onboard = carga + dt.timedelta(minutes=rnd.randint(1, 50)) if carga and rnd.random() < 0.7 else None
+        ws.append([contenedor(i), rnd.choice(["45R1", "22R1", "45G1"]), _fecha(t_in, texto),
+                   _fecha(conexion, texto), _fecha(solicitud, texto), _fecha(desconexion, texto),
+                   _fecha(carga, texto), _fecha(onboard, texto), f"B{rnd.randint(1, 40):02d}"])
+    ws.append(["Total", len(ids)])
+    wb.save(ruta)
+
+def generar_monitor(ruta, ids, semilla=0):
+    rnd = random.Random(semilla)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Monitor")
+    ws.append(["MONITOR REEFERS"])
+    ws.append(["Generado", "05/03/2025"])
+    ws.append([None])
+    ws.append(COLUMNAS_MONITOR)
+    for i in ids:
+        r = rnd.random()
+        s1 = round(rnd.uniform(-25, 8), 1) if r < 0.45 else None
+        s2 = " " if r > 0.92 else None  # Texto vacío: no cuenta como CT
+        s1_dup = round(rnd.uniform(-25, 8), 1) if 0.45 <= r < 0.5 else None
+        ws.append([contenedor(i), rnd.choice(["ON", "OFF"]), -18.0, s1, s2, None, None, s1_dup, None,
+                   rnd.choice(["SITRANS", "OTRO"]), f"P{rnd.randint(1, 9)}", None])
+    wb.save(ruta)
+
+def generar_escenario(carpeta, contenedores, archivos, semilla=0):
+    """Reparte `contenedores` en `archivos` reportes (una rotación cada uno) y otros tantos monitores solapados.
+
+    Devuelve (rutas_reportes, rutas_monitores).
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    por_archivo = max(1, contenedores // archivos)
+    rutas_rep, rutas_mon = [], []
+    for k in range(archivos):
+        ids = range(k * por_archivo, (k + 1) * por_archivo)
+        ruta = os.path.join(carpeta, f"reporte_{k:02d}.xlsx")
+        generar_reporte(ruta, f"{2500 + k}", f"NAVE {k:02d}", ids, semilla=semilla + k)
+        rutas_rep.append(ruta)
+
+        # Cada monitor cubre su tramo y la mitad del siguiente: UNIDAD repetidas entre archivos
+        ids_mon = range(k * por_archivo, min(contenedores, (k + 1) * por_archivo + por_archivo // 2))
+        ruta = os.path.join(carpeta, f"monitor_{k:02d}.xlsx")
+        generar_monitor(ruta, ids_mon, semilla=semilla + 1000 + k)
+        rutas_mon.append(ruta)
+    return rutas_rep, rutas_mon
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera workbooks sintéticos de reportes y monitores.")
+    parser.add_argument("--contenedores", type=int, default=1000)
+    parser.add_argument("--archivos", type=int, default=1)
+    parser.add_argument("--salida", required=True)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+    reps, mons = generar_escenario(args.salida, args.contenedores, args.archivos, args.semilla)
+    print(f"{len(reps)} reportes y {len(mons)} monitores en {args.salida}")
@@ -0,0 +1,4 @@
+"""Motor de Sitrans Control Operaciones: lectura de reportes/monitores, maestro acumulado y KPIs.
+
+`app.py` (Streamlit) y el modo batch (`python -m sitrans`) usan los mismos módulos.
+"""
@@ -0,0 +1,169 @@
+"""Maestro acumulado de archivos Monitor en SQLite, indexado por UNIDAD."""
+import io
+import os
+import hashlib
+import sqlite3
+import datetime
+import threading
+
+import pandas as pd
+
+from sitrans import ingesta
+
+# --- CONFIGURACIÓN LÓGICA MONITOR ---
+ARCHIVO_MAESTRO = "monitor_maestro_acumulado.db"
+ARCHIVO_MAESTRO_XLSX = "monitor_maestro_acumulado.xlsx"  # Formato antiguo, se migra al abrir
+TABLA_MAESTRO = "monitor"
+TIMEOUT_SEG = 30  # Espera máxima si otro proceso (p. ej. el modo batch) está escribiendo
+
+# Todas las sesiones de la app comparten el maestro: las escrituras de este proceso van de a una
+BLOQUEO_ESCRITURA = threading.RLock()
+
+# Sin disco (p. ej. Streamlit Cloud sin permiso de escritura) el maestro vive en memoria, uno
+# por proceso y ruta: quien integra monitores y quien lee rotaciones ven la misma base
+_EN_MEMORIA = {}  # ruta -> conexión que mantiene viva la base compartida
+
+# --- ALMACÉN MONITOR (SQLite indexado por UNIDAD) ---
+sqlite3.register_adapter(pd.Timestamp, lambda ts: ts.isoformat(sep=" "))
+sqlite3.register_adapter(datetime.datetime, lambda ts: ts.isoformat(sep=" "))
+sqlite3.register_adapter(datetime.time, lambda t: t.isoformat())
+
+def _uri_memoria(ruta):
+    return f"file:maestro_{hashlib.md5(os.path.abspath(ruta).encode()).hexdigest()}?mode=memory&cache=shared"
+
+def _conectar_en_memoria(ruta):
+    with BLOQUEO_ESCRITURA:
+        if ruta not in _EN_MEMORIA:
+            vigia = sqlite3.connect(_uri_memoria(ruta), uri=True, check_same_thread=False)
+            vigia.execute(f'CREATE TABLE IF NOT EXISTS {TABLA_MAESTRO} ("UNIDAD" TEXT PRIMARY KEY, "TIPO_CONTENEDOR" TEXT)')
+            vigia.commit()
+            _EN_MEMORIA[ruta] = vigia
+    con = sqlite3.connect(_uri_memoria(ruta), uri=True, timeout=TIMEOUT_SEG)
+    # Con caché compartida una lectura no espera a la escritura en curso sino que falla;
+    # las escrituras ya van de a una (BLOQUEO_ESCRITURA), así que se lee sin bloqueo de tabla
+    con.execute("PRAGMA read_uncommitted = 1")
+    return con
+
+def conectar_maestro(ruta=ARCHIVO_MAESTRO, ruta_xlsx=ARCHIVO_MAESTRO_XLSX):
+    if ruta in _EN_MEMORIA: con = _conectar_en_memoria(ruta)
+    else:
+        if not os.path.exists(ruta):
+            with BLOQUEO_ESCRITURA:
+                if not os.path.exists(ruta): _crear_maestro(ruta, ruta_xlsx)
+        try:
+            con = sqlite3.connect(ruta, timeout=TIMEOUT_SEG)
+            con.execute(f'CREATE TABLE IF NOT EXISTS {TABLA_MAESTRO} ("UNIDAD" TEXT PRIMARY KEY, "TIPO_CONTENEDOR" TEXT)')
+        except sqlite3.Error:
+            # En Streamlit Cloud a veces no deja guardar: trabajamos en memoria (compartida)
+            con = _conectar_en_memoria(ruta)
+
+    # Bases creadas antes de guardar la clasificación: se clasifican completas una vez
+    if "TIPO_CONTENEDOR" not in columnas_maestro(con):
+        with BLOQUEO_ESCRITURA, con:
+            if "TIPO_CONTENEDOR" not in columnas_maestro(con):
+                con.execute(f'ALTER TABLE {TABLA_MAESTRO} ADD COLUMN "TIPO_CONTENEDOR" TEXT')
+                reclasificar_reefer(con)
+    return con
+
+def _crear_maestro(ruta, ruta_xlsx):
+    """Arma el maestro nuevo (con la migración única del Excel antiguo) en un archivo
+    temporal y lo publica con un rename atómico: nadie ve una base a medio migrar."""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        con = sqlite3.connect(temporal)
+        try:
+            con.execute(f'CREATE TABLE {TABLA_MAESTRO} ("UNIDAD" TEXT PRIMARY KEY, "TIPO_CONTENEDOR" TEXT)')
+            if os.path.exists(ruta_xlsx):
+                try:
+                    df_antiguo = pd.read_excel(ruta_xlsx)
+                    if 'UNIDAD' in df_antiguo.columns:
+                        df_antiguo = df_antiguo[df_antiguo['UNIDAD'].notna()].drop_duplicates(subset=['UNIDAD'])
+                        upsert_maestro(con, df_antiguo.set_index('UNIDAD'))
+                except Exception: pass
+        finally: con.close()
+        os.replace(temporal, ruta)
+    except (sqlite3.Error, OSError):
+        # Sin permiso de escritura: conectar_maestro cae a memoria
+        try: os.remove(temporal)
+        except OSError: pass
+
+def version_maestro(ruta=ARCHIVO_MAESTRO):
+    """Contador que sube con cada upsert; sirve de clave de caché para lo que se lee del maestro."""
+    en_memoria = ruta in _EN_MEMORIA
+    if not en_memoria and not os.path.exists(ruta): return 0
+    try:
+        con = _conectar_en_memoria(ruta) if en_memoria else sqlite3.connect(ruta, timeout=TIMEOUT_SEG)
+        try: return con.execute("PRAGMA user_version").fetchone()[0]
+        finally: con.close()
+    except sqlite3.Error: return 0
+
+def columnas_maestro(con):
+    return {fila[1]: fila[2] for fila in con.execute(f"PRAGMA table_info({TABLA_MAESTRO})")}
+
+def upsert_maestro(con, df_nuevo):
+    """Inserta o actualiza filas por UNIDAD con la misma semántica que combine_first:
+    los valores nuevos no nulos reemplazan a los existentes, los nulos conservan el histórico.
+    TIPO_CONTENEDOR se recalcula solo para las unidades recibidas."""
+    if df_nuevo.empty: return
+    df_nuevo = df_nuevo.reset_index().drop(columns=['TIPO_CONTENEDOR'], errors='ignore')
+    df_nuevo['UNIDAD'] = df_nuevo['UNIDAD'].astype(str)
+    with BLOQUEO_ESCRITURA, con:
+        existentes = columnas_maestro(con)
+        for col in df_nuevo.columns:
+            if col not in existentes:
+                tipo = " TIMESTAMP" if pd.api.types.is_datetime64_any_dtype(df_nuevo[col]) else ""
+                con.execute(f'ALTER TABLE {TABLA_MAESTRO} ADD COLUMN "{col}"{tipo}')
+
+        cols = list(df_nuevo.columns)
+        cols_sql = ", ".join(f'"{c}"' for c in cols)
+        update_sql = ", ".join(f'"{c}" = COALESCE(excluded."{c}", {TABLA_MAESTRO}."{c}")' for c in cols if c != 'UNIDAD')
+        sql = f"INSERT INTO {TABLA_MAESTRO} ({cols_sql}) VALUES ({', '.join('?' * len(cols))})"
+        sql += f" ON CONFLICT(UNIDAD) DO UPDATE SET {update_sql}" if update_sql else " ON CONFLICT(UNIDAD) DO NOTHING"
+
+        valores = df_nuevo.astype(object).where(df_nuevo.notna(), None)
+        con.executemany(sql, valores.itertuples(index=False, name=None))
+        reclasificar_reefer(con, df_nuevo['UNIDAD'])
+        # En la misma transacción que los datos
+        version = con.execute("PRAGMA user_version").fetchone()[0]
+        con.execute(f"PRAGMA user_version = {version + 1}")
+
+def reclasificar_reefer(con, unidades=None):
+    cols = ['UNIDAD'] + [c for c in ingesta.COLS_SENSORES if c in columnas_maestro(con)]
+    df = cargar_maestro(con, unidades, columnas=cols)
+    tipos = ingesta.clasificar_reefer(df)
+    con.executemany(f'UPDATE {TABLA_MAESTRO} SET "TIPO_CONTENEDOR" = ? WHERE UNIDAD = ?', zip(tipos, df['UNIDAD']))
+
+def cargar_maestro(con, unidades=None, columnas=None):
+    """Lee el maestro completo o solo las unidades (y columnas) indicadas."""
+    cols_fecha = [c for c, tipo in columnas_maestro(con).items() if tipo == "TIMESTAMP" and (columnas is None or c in columnas)]
+    select_sql = "m.*" if columnas is None else ", ".join(f'm."{c}"' for c in columnas)
+    if unidades is None:
+        query = f"SELECT {select_sql} FROM {TABLA_MAESTRO} m"
+    else:
+        con.execute("CREATE TEMP TABLE IF NOT EXISTS filtro_unidades (UNIDAD TEXT PRIMARY KEY)")
+        con.execute("DELETE FROM filtro_unidades")
+        con.executemany("INSERT OR IGNORE INTO filtro_unidades VALUES (?)", ((str(u),) for u in unidades))
+        query = f"SELECT {select_sql} FROM {TABLA_MAESTRO} m JOIN filtro_unidades f ON f.UNIDAD = m.UNIDAD"
+    df = pd.read_sql_query(query, con, parse_dates=cols_fecha)
+    vacias = df.columns[df.isna().all()]
+    df[vacias] = df[vacias].astype(float)
+    return df
+
+def exportar_maestro_excel(ruta=ARCHIVO_MAESTRO):
+    con = conectar_maestro(ruta)
+    try: df_maestro = cargar_maestro(con)
+    finally: con.close()
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df_maestro.to_excel(writer, index=False)
+    return buffer.getvalue()
+
+def borrar_historial(ruta=ARCHIVO_MAESTRO, ruta_xlsx=ARCHIVO_MAESTRO_XLSX):
+    """Elimina el maestro (y el Excel antiguo, para que no se vuelva a migrar). Devuelve si había algo."""
+    with BLOQUEO_ESCRITURA:
+        archivos_historial = [a for a in (ruta, ruta_xlsx) if os.path.exists(a)]
+        for a in archivos_historial: os.remove(a)
+        # La base en memoria se libera al cerrar su última conexión
+        vigia = _EN_MEMORIA.pop(ruta, None)
+        if vigia is not None: vigia.close()
+    return bool(archivos_historial) or vigia is not None
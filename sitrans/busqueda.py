@@ -0,0 +1,91 @@
+"""Índice de búsqueda de contenedores de una rotación.
+
+Se arma una vez por dataset y rotación y entrega posiciones de fila que las
+tres pestañas reutilizan. La búsqueda es literal y sin distinguir mayúsculas:
+
+- términos solo con letras (dueño ISO, p. ej. TRHU): rangos de un arreglo ordenado;
+- términos de 3 o más caracteres (p. ej. dígitos del número): trigramas;
+- términos más cortos: recorrido vectorizado sobre los valores distintos.
+
+Una lista pegada (plan de estiba) se resuelve de una vez contra el arreglo ordenado.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+LARGO_NGRAMA = 3
+_SEPARADORES = re.compile(r"[\s,;]+")
+_SOLO_LETRAS = re.compile(r"[A-Z]+")
+_FORMA_ISO = re.compile(r"[A-Z]*[^A-Z]*")  # Letras del dueño y después ninguna letra
+
+def normalizar(texto):
+    return str(texto).strip().upper()
+
+def indexar(contenedores):
+    """Índice sobre la columna CONTENEDOR; las posiciones siguen el orden de `contenedores`."""
+    codigos, claves = pd.factorize(contenedores.astype(str).str.strip().str.upper())
+    claves = np.asarray(claves, dtype=str)
+    orden = np.argsort(claves, kind="stable")
+
+    ngramas = {}
+    for id_clave, clave in enumerate(claves):
+        for ngrama in {clave[i:i + LARGO_NGRAMA] for i in range(len(clave) - LARGO_NGRAMA + 1)}:
+            ngramas.setdefault(ngrama, []).append(id_clave)
+
+    # Con forma ISO, un término de solo letras solo puede calzar dentro del dueño
+    forma_iso = all(_FORMA_ISO.fullmatch(c) for c in claves)
+    duenos = sorted({_SOLO_LETRAS.match(c).group() for c in claves if _SOLO_LETRAS.match(c)}) if forma_iso else None
+    return {
+        "codigos": codigos,            # fila -> id de clave
+        "claves": claves,              # id de clave -> texto normalizado
+        "orden": orden,                # claves ordenadas -> id de clave
+        "ordenadas": claves[orden],
+        "ngramas": {g: np.array(ids) for g, ids in ngramas.items()},
+        "duenos": duenos,
+    }
+
+def _filas(indice, ids_clave):
+    """Posiciones (ordenadas) de las filas cuyas claves están en `ids_clave`."""
+    marcadas = np.zeros(len(indice["claves"]), dtype=bool)
+    marcadas[ids_clave] = True
+    return np.flatnonzero(marcadas[indice["codigos"]])
+
+def _rango_prefijo(indice, prefijo):
+    ordenadas = indice["ordenadas"]
+    inicio, fin = np.searchsorted(ordenadas, [prefijo, prefijo + "\uffff"])
+    return indice["orden"][inicio:fin]
+
+def buscar(indice, termino):
+    """Posiciones de las filas cuyo contenedor contiene `termino`."""
+    termino = normalizar(termino)
+    if not termino: return np.arange(len(indice["codigos"]))
+
+    if indice["duenos"] is not None and _SOLO_LETRAS.fullmatch(termino):
+        rangos = [_rango_prefijo(indice, d) for d in indice["duenos"] if termino in d]
+        ids = np.concatenate(rangos) if rangos else np.empty(0, dtype=np.intp)
+    elif len(termino) >= LARGO_NGRAMA:
+        ids = None
+        for i in range(len(termino) - LARGO_NGRAMA + 1):
+            lista = indice["ngramas"].get(termino[i:i + LARGO_NGRAMA])
+            if lista is None: return np.empty(0, dtype=np.intp)
+            ids = lista if ids is None else np.intersect1d(ids, lista, assume_unique=True)
+        # Los trigramas dan candidatos; el término completo se confirma solo sobre ellos
+        ids = ids[np.char.find(indice["claves"][ids], termino) >= 0]
+    else:
+        ids = np.flatnonzero(np.char.find(indice["claves"], termino) >= 0)
+    return _filas(indice, ids)
+
+def buscar_lote(indice, texto):
+    """Contenedores pegados (separados por salto de línea, espacio, coma o punto y coma).
+
+    Devuelve (posiciones de las filas encontradas, contenedores no encontrados).
+    """
+    pedidos = list(dict.fromkeys(t for t in _SEPARADORES.split(texto.upper()) if t))
+    ordenadas = indice["ordenadas"]
+    if not pedidos or not len(ordenadas): return np.empty(0, dtype=np.intp), pedidos
+    pedidos_arr = np.array(pedidos, dtype=str)
+    pos = np.minimum(np.searchsorted(ordenadas, pedidos_arr), len(ordenadas) - 1)
+    encontrados = ordenadas[pos] == pedidos_arr
+    faltantes = [p for p, ok in zip(pedidos, encontrados) if not ok]
+    return _filas(indice, indice["orden"][pos[encontrados]]), faltantes
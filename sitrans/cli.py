@@ -0,0 +1,114 @@
+"""Modo batch sin navegador (p. ej. desde cron).
+
+    python -m sitrans --reportes DIR --monitores DIR --salida DIR
+
+Escribe un Excel KPI por rotación (Reporte_<rotación>.xlsx) y un resumen.json
+legible por máquina en la carpeta de salida.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from contextlib import ExitStack
+
+import pandas as pd
+
+from sitrans import almacen, diagnostico, exportar, historico, ingesta, kpi, pipeline
+
+EXTENSIONES = (".xls", ".xlsx")
+
+def listar_archivos(carpeta):
+    """Archivos Excel de la carpeta, del más antiguo al más nuevo (orden de carga)."""
+    rutas = [os.path.join(carpeta, n) for n in os.listdir(carpeta)
+             if n.lower().endswith(EXTENSIONES) and not n.startswith("~$")]
+    return sorted(rutas, key=lambda r: (os.path.getmtime(r), r))
+
+def _numero(valor):
+    # JSON no admite NaN: los promedios sin datos quedan en null
+    if valor is None or math.isnan(valor): return None
+    return round(float(valor), 2)
+
+def resumen_rotacion(df, rotacion):
+    procesos = {}
+    for proceso in kpi.PAREJAS:
+        r = kpi.resumen_proceso(df, proceso)
+        estados = df[f"Estado_{proceso}"].value_counts().loc[lambda c: c > 0]
+        procesos[proceso] = {
+            "estados": {k: int(v) for k, v in estados.items()},
+            "semaforo": {} if r is None else {k: int(v) for k, v in r["conteos"].items()},
+            "cumplimiento_pct": None if r is None else _numero(r["pct"]),
+            "promedio_min": None if r is None else _numero(r["prom_global"]),
+            "promedio_min_ct": None if r is None else _numero(r["prom_ct"]),
+            "promedio_min_general": None if r is None else _numero(r["prom_gen"]),
+            "fuera_de_plazo": None if r is None else r["rojos_total"],
+            "fuera_de_plazo_ct": None if r is None else r["rojos_ct"],
+        }
+    return {
+        "rotacion": rotacion,
+        "nave": str(df['NAVE_DETECTADA'].iloc[0]),
+        "fecha_consulta": str(df['FECHA_CONSULTA'].iloc[0]),
+        "contenedores": len(df),
+        "ct": int((df['TIPO'] == 'CT').sum()),
+        "general": int((df['TIPO'] == 'General').sum()),
+        "procesos": procesos,
+    }
+
+def nombre_archivo(rotacion):
+    return "Reporte_" + re.sub(r"\W+", "_", rotacion).strip("_") + ".xlsx"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m sitrans", description="Procesa reportes y monitores Sitrans sin interfaz.")
+    parser.add_argument("--reportes", required=True, help="Carpeta con los reportes (.xls/.xlsx)")
+    parser.add_argument("--monitores", required=True, help="Carpeta con los archivos Monitor (.xlsx)")
+    parser.add_argument("--salida", required=True, help="Carpeta donde se escriben los Excel y resumen.json")
+    parser.add_argument("--maestro", default=almacen.ARCHIVO_MAESTRO, help="Base del monitor acumulado")
+    parser.add_argument("--historico", default=historico.ARCHIVO_HISTORICO, help="Base del histórico de KPI (vista Histórico)")
+    parser.add_argument("--cache", default=ingesta.CARPETA_CACHE, help="Carpeta de la caché de parseo")
+    parser.add_argument("--log-diagnostico", metavar="RUTA", help="Agrega tiempos y filas por etapa a este log JSONL")
+    args = parser.parse_args(argv)
+
+    ingesta.CARPETA_CACHE = args.cache
+    rutas_rep = listar_archivos(args.reportes)
+    rutas_mon = listar_archivos(args.monitores)
+    if not rutas_rep or not rutas_mon:
+        print("Se necesita al menos un reporte y un archivo Monitor.", file=sys.stderr)
+        return 1
+
+    with ExitStack() as stack:
+        mediciones = stack.enter_context(diagnostico.capturar())
+        files_rep = [stack.enter_context(open(r, "rb")) for r in rutas_rep]
+        files_mon = [stack.enter_context(open(r, "rb")) for r in rutas_mon]
+        df_master, avisos = pipeline.procesar_datos_completos(files_rep, files_mon, args.maestro)
+
+    for nivel, mensaje in avisos:
+        print(f"[{nivel}] {mensaje}", file=sys.stderr)
+    if args.log_diagnostico: diagnostico.anotar_jsonl(mediciones, {"fase": "ingesta"}, args.log_diagnostico)
+    if df_master is None:
+        print("Error al procesar archivos. Revisa el formato del Monitor.", file=sys.stderr)
+        return 1
+
+    os.makedirs(args.salida, exist_ok=True)
+    ahora = pd.Timestamp.now()
+    rotaciones = []
+    for rotacion in df_master['ROTACION_LABEL'].unique():
+        df = pipeline.kpis_rotacion(df_master, rotacion, ahora)
+        archivo = nombre_archivo(rotacion)
+        exportar.excel(df, os.path.join(args.salida, archivo))
+        historico.registrar(df, args.historico)
+        rotaciones.append({**resumen_rotacion(df, rotacion), "archivo": archivo})
+
+    resumen = {
+        "generado": ahora.isoformat(timespec="seconds"),
+        "reportes": [os.path.basename(r) for r in rutas_rep],
+        "monitores": [os.path.basename(r) for r in rutas_mon],
+        "avisos": [{"nivel": n, "mensaje": m} for n, m in avisos],
+        "rotaciones": rotaciones,
+    }
+    # Escritura atómica: un lector (dashboard, otro cron) nunca ve el JSON a medias
+    ruta_resumen = os.path.join(args.salida, "resumen.json")
+    with open(ruta_resumen + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(resumen, f, ensure_ascii=False, indent=2)
+    os.replace(ruta_resumen + ".tmp", ruta_resumen)
+    return 0
@@ -0,0 +1,85 @@
+"""Medición por etapa (tiempo, filas, memoria) y perfilado puntual del pipeline.
+
+Las etapas se registran con `etapa(...)` y se juntan con `capturar()`; fuera de
+un `capturar()` activo no se guarda nada, así que instrumentar no cuesta más
+que dos lecturas de reloj.
+"""
+import contextvars
+import cProfile
+import io
+import json
+import marshal
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+ARCHIVO_LOG = "diagnostico_etapas.jsonl"
+
+_ACTUAL = contextvars.ContextVar("mediciones_sitrans", default=None)
+
+def memoria_mb():
+    """Memoria residente del proceso (Linux); None si no se puede leer."""
+    try:
+        with open("/proc/self/statm") as f: paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError): return None
+
+@contextmanager
+def capturar():
+    """Junta en una lista las mediciones de las etapas ejecutadas dentro del bloque."""
+    mediciones = []
+    token = _ACTUAL.set(mediciones)
+    try: yield mediciones
+    finally: _ACTUAL.reset(token)
+
+@contextmanager
+def etapa(nombre, filas_entrada=None):
+    """Mide el bloque; quien lo usa puede completar registro["filas_salida"]."""
+    registro = {"etapa": nombre, "filas_entrada": filas_entrada, "filas_salida": None}
+    mem_ini = memoria_mb()
+    t0 = time.perf_counter()
+    try: yield registro
+    finally:
+        registro["seg"] = time.perf_counter() - t0
+        mem_fin = memoria_mb()
+        registro["delta_mb"] = None if mem_ini is None or mem_fin is None else mem_fin - mem_ini
+        destino = _ACTUAL.get()
+        if destino is not None: destino.append(registro)
+
+def tabla(mediciones):
+    return pd.DataFrame(mediciones, columns=["etapa", "seg", "filas_entrada", "filas_salida", "delta_mb"])
+
+def anotar_jsonl(mediciones, contexto=None, ruta=ARCHIVO_LOG):
+    """Agrega una línea JSON por etapa, con marca de tiempo y el contexto (p. ej. rotación)."""
+    marca = pd.Timestamp.now().isoformat(timespec="seconds")
+    with open(ruta, "a", encoding="utf-8") as f:
+        for m in mediciones:
+            f.write(json.dumps({"ts": marca, **(contexto or {}), **m}, ensure_ascii=False) + "\n")
+
+@contextmanager
+def perfilar(lineas=30):
+    """cProfile + tracemalloc sobre el bloque.
+
+    Al salir, el dict entregado tiene "prof" (bytes en formato .prof de pstats),
+    "resumen" (funciones por tiempo acumulado) y "memoria" (líneas con más asignación).
+    """
+    resultado = {}
+    perfil = cProfile.Profile()
+    tracemalloc.start()
+    perfil.enable()
+    try: yield resultado
+    finally:
+        perfil.disable()
+        instantanea = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        perfil.create_stats()
+        resultado["prof"] = marshal.dumps(perfil.stats)
+        texto = io.StringIO()
+        pstats.Stats(perfil, stream=texto).sort_stats("cumulative").print_stats(lineas)
+        resultado["resumen"] = texto.getvalue()
+        resultado["memoria"] = "\n".join(str(s) for s in instantanea.statistics("lineno")[:lineas])
@@ -0,0 +1,93 @@
+"""Exportación del reporte de una rotación: Excel completo, Excel por proceso, CSV y Parquet.
+
+Los Excel se escriben con xlsxwriter en modo constant_memory: las filas van al
+archivo a medida que se escriben, sin armar la hoja completa en memoria. Por eso
+se escriben fila por fila y no con `DataFrame.to_excel` (que recorre por columnas).
+"""
+import io
+
+from sitrans import kpi
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FORMATO_FECHA = "yyyy-mm-dd hh:mm:ss"
+FILAS_POR_BLOQUE = 10_000  # Filas que se convierten a objetos de Python a la vez
+
+def _filas(df):
+    """Tuplas de valores de Python por fila, con None en los nulos (celda vacía)."""
+    for inicio in range(0, len(df), FILAS_POR_BLOQUE):
+        bloque = df.iloc[inicio:inicio + FILAS_POR_BLOQUE].astype(object)
+        yield from bloque.where(bloque.notna(), None).itertuples(index=False, name=None)
+
+def _libro(destino):
+    import xlsxwriter  # Diferido, como los motores de lectura: solo al descargar
+    return xlsxwriter.Workbook(destino, {"constant_memory": True, "default_date_format": FORMATO_FECHA})
+
+def _encabezado(libro, hoja, columnas):
+    hoja.write_row(0, 0, [str(c) for c in columnas], libro.add_format({"bold": True, "border": 1}))
+    hoja.freeze_panes(1, 0)
+
+def excel(df, destino):
+    """Todas las columnas del reporte en una hoja."""
+    libro = _libro(destino)
+    hoja = libro.add_worksheet()
+    _encabezado(libro, hoja, df.columns)
+    for fila, valores in enumerate(_filas(df), start=1):
+        hoja.write_row(fila, 0, valores)
+    libro.close()
+
+def excel_por_proceso(df, destino):
+    """Una hoja por proceso con las columnas de la grilla y el color de semáforo ya calculado."""
+    libro = _libro(destino)
+    # El formato de fila reemplaza al de columna: cada fondo lleva también el de los minutos
+    fondos = {color: libro.add_format({"bg_color": color, "num_format": "0.0"}) for color in kpi.COLORES.categories if color}
+    sin_fondo = libro.add_format({"num_format": "0.0"})
+    for proceso in kpi.PAREJAS:
+        hoja = libro.add_worksheet(proceso[:31])
+        cols = ['CONTENEDOR', 'TIPO', f"Ver_Tiempo_{proceso}", f"Estado_{proceso}", f"Min_{proceso}",
+                f"Semaforo_{proceso}", f"Cumple_{proceso}"]
+        _encabezado(libro, hoja, ['Contenedor', 'Tipo', 'Tiempo', 'Estado', 'Minutos', 'Semáforo', 'Cumple'])
+        hoja.set_column(0, 0, 16)
+        hoja.set_column(2, 6, 12)
+        colores = df[f"Color_{proceso}"].astype(str).to_numpy()
+        for fila, (valores, color) in enumerate(zip(_filas(df[cols]), colores), start=1):
+            hoja.write_row(fila, 0, valores, fondos.get(color, sin_fondo))
+    libro.close()
+
+def csv(df, destino):
+    # Con BOM para que Excel lea bien los acentos
+    destino.write(df.to_csv(index=False).encode("utf-8-sig"))
+
+def _columnas_arrow(df):
+    """Copia de `df` donde las columnas que Arrow no puede tipar pasan a texto.
+
+    Los reportes traen los valores crudos de cada celda y los sensores leídos del
+    maestro mezclan números con " ": columnas object (o categóricas tras
+    compactar_tipos) con tipos mezclados, que to_parquet rechaza.
+    """
+    import pyarrow as pa  # Diferido: solo al descargar en Parquet
+    mezcladas = {}
+    for col in df.columns:
+        serie = df[col]
+        if serie.dtype == object: valores = serie
+        elif serie.dtype.name == "category": valores = serie.cat.categories
+        else: continue
+        try: pa.array(valores, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError): mezcladas[col] = serie.astype("string")
+    return df.assign(**mezcladas) if mezcladas else df
+
+def parquet(df, destino):
+    _columnas_arrow(df).to_parquet(destino, index=False)
+
+# Nombre visible -> (función, extensión, tipo MIME)
+FORMATOS = {
+    "Excel completo": (excel, "xlsx", MIME_XLSX),
+    "Excel por proceso": (excel_por_proceso, "xlsx", MIME_XLSX),
+    "CSV": (csv, "csv", "text/csv"),
+    "Parquet": (parquet, "parquet", "application/vnd.apache.parquet"),
+}
+
+def generar(formato, df):
+    """Bytes del archivo en el formato pedido (nombre de FORMATOS)."""
+    buffer = io.BytesIO()
+    FORMATOS[formato][0](df, buffer)
+    return buffer.getvalue()
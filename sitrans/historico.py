@@ -0,0 +1,155 @@
+"""Histórico de KPIs por contenedor y resúmenes precalculados, en SQLite.
+
+Cada rotación procesada reemplaza su foto anterior (reprocesarla no duplica) y
+recalcula sus resúmenes por nave, rotación, día, proceso y tipo. Los resúmenes
+guardan conteos, sumas y un histograma de minutos, así que se agregan a
+cualquier nivel (semana, mes, nave...) y dan percentiles sin volver al detalle
+ni a los Excel de origen.
+"""
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from sitrans import kpi
+
+ARCHIVO_HISTORICO = "historico_kpi.db"
+TIMEOUT_SEG = 30
+TOPE_HISTOGRAMA = 240  # Minutos; lo que lo supera cae en el último tramo
+PERIODOS = {"Día": "D", "Semana": "W", "Mes": "M"}
+
+BLOQUEO_ESCRITURA = threading.RLock()
+
+_CLAVE_RESUMEN = "ROTACION_LABEL TEXT, NAVE TEXT, DIA TEXT, PROCESO TEXT, TIPO TEXT"
+_ESQUEMA = [
+    """CREATE TABLE IF NOT EXISTS rotaciones (
+        ROTACION_LABEL TEXT PRIMARY KEY, NAVE TEXT, ROTACION TEXT, FECHA_CONSULTA TEXT, REGISTRADO TIMESTAMP)""",
+    """CREATE TABLE IF NOT EXISTS kpi_contenedor (
+        ROTACION_LABEL TEXT, NAVE TEXT, CONTENEDOR TEXT, TIPO TEXT, PROCESO TEXT, ESTADO TEXT,
+        INICIO TIMESTAMP, DIA TEXT, MINUTOS REAL, CUMPLE INTEGER, SEMAFORO TEXT,
+        PRIMARY KEY (ROTACION_LABEL, CONTENEDOR, PROCESO))""",
+    f"""CREATE TABLE IF NOT EXISTS kpi_resumen ({_CLAVE_RESUMEN},
+        ACTIVOS INTEGER, CUMPLEN INTEGER, VERDES INTEGER, AMARILLOS INTEGER, ROJOS INTEGER,
+        SUMA_MINUTOS REAL, CON_MINUTOS INTEGER)""",
+    f"CREATE TABLE IF NOT EXISTS kpi_histograma ({_CLAVE_RESUMEN}, MINUTO INTEGER, N INTEGER)",
+    "CREATE INDEX IF NOT EXISTS idx_resumen_rotacion ON kpi_resumen (ROTACION_LABEL)",
+    "CREATE INDEX IF NOT EXISTS idx_histograma_rotacion ON kpi_histograma (ROTACION_LABEL)",
+]
+
+def conectar(ruta=ARCHIVO_HISTORICO):
+    con = sqlite3.connect(ruta, timeout=TIMEOUT_SEG)
+    for sql in _ESQUEMA: con.execute(sql)
+    return con
+
+def version(ruta=ARCHIVO_HISTORICO):
+    """Sube con cada registro; sirve de clave de caché para las consultas."""
+    if not os.path.exists(ruta): return 0
+    try:
+        con = sqlite3.connect(ruta, timeout=TIMEOUT_SEG)
+        try: return con.execute("PRAGMA user_version").fetchone()[0]
+        finally: con.close()
+    except sqlite3.Error: return 0
+
+def filas_contenedor(df):
+    """KPI de una rotación en formato largo: una fila por contenedor y proceso."""
+    partes = []
+    for proceso, cols in kpi.PAREJAS.items():
+        inicio = df[cols["Ini"]] if cols["Ini"] in df.columns else pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+        partes.append(pd.DataFrame({
+            "ROTACION_LABEL": df['ROTACION_LABEL'].astype(str),
+            "NAVE": df['NAVE_DETECTADA'].astype(str),
+            "CONTENEDOR": df['CONTENEDOR'].astype(str),
+            "TIPO": df['TIPO'].astype(str),
+            "PROCESO": proceso,
+            "ESTADO": df[f"Estado_{proceso}"].astype(str),
+            "INICIO": inicio.dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "DIA": inicio.dt.strftime("%Y-%m-%d"),
+            "MINUTOS": df[f"Min_{proceso}"].astype(float),
+            "CUMPLE": df[f"Cumple_{proceso}"].astype(bool).astype(int),
+            "SEMAFORO": df[f"Semaforo_{proceso}"].astype(str),
+        }))
+    largo = pd.concat(partes, ignore_index=True)
+    # Un contenedor repetido en el reporte queda una vez, con su última fila
+    return largo.drop_duplicates(subset=["ROTACION_LABEL", "CONTENEDOR", "PROCESO"], keep="last")
+
+def registrar(df, ruta=ARCHIVO_HISTORICO):
+    """Guarda (o reemplaza) la foto de KPI de las rotaciones de `df` y recalcula sus resúmenes.
+
+    Devuelve False si no se pudo escribir (p. ej. disco de solo lectura); el histórico
+    es opcional y no debe detener el dashboard.
+    """
+    if df.empty: return False
+    largo = filas_contenedor(df)
+    largo = largo.astype(object).where(largo.notna(), None)
+    rotaciones = [
+        (etiqueta, str(g['NAVE_DETECTADA'].iloc[0]), str(g['ROTACION_DETECTADA'].iloc[0]),
+         str(g['FECHA_CONSULTA'].iloc[0]), pd.Timestamp.now().isoformat(sep=" ", timespec="seconds"))
+        for etiqueta, g in df.groupby(df['ROTACION_LABEL'].astype(str), observed=True)
+    ]
+    etiquetas = [(r[0],) for r in rotaciones]
+    try:
+        with BLOQUEO_ESCRITURA:
+            con = conectar(ruta)
+            try:
+                with con:
+                    for tabla in ("kpi_contenedor", "kpi_resumen", "kpi_histograma"):
+                        con.executemany(f"DELETE FROM {tabla} WHERE ROTACION_LABEL = ?", etiquetas)
+                    con.executemany("INSERT OR REPLACE INTO rotaciones VALUES (?, ?, ?, ?, ?)", rotaciones)
+                    con.executemany(f"INSERT INTO kpi_contenedor ({', '.join(largo.columns)}) VALUES ({', '.join('?' * len(largo.columns))})",
+                                    largo.itertuples(index=False, name=None))
+                    _resumir(con, etiquetas)
+                    v = con.execute("PRAGMA user_version").fetchone()[0]
+                    con.execute(f"PRAGMA user_version = {v + 1}")
+            finally: con.close()
+        return True
+    except (sqlite3.Error, OSError): return False
+
+def _resumir(con, etiquetas):
+    # Solo contenedores activos (terminados o pendientes), como kpi.resumen_proceso
+    filtro = "ROTACION_LABEL = ? AND ESTADO <> 'Sin Solicitud' AND DIA IS NOT NULL"
+    clave = "ROTACION_LABEL, NAVE, DIA, PROCESO, TIPO"
+    con.executemany(f"""
+        INSERT INTO kpi_resumen
+        SELECT {clave}, COUNT(*), SUM(CUMPLE), SUM(SEMAFORO = 'Verde'), SUM(SEMAFORO = 'Amarillo'),
+               SUM(SEMAFORO = 'Rojo'), TOTAL(MINUTOS), COUNT(MINUTOS)
+        FROM kpi_contenedor WHERE {filtro} GROUP BY {clave}""", etiquetas)
+    con.executemany(f"""
+        INSERT INTO kpi_histograma
+        SELECT {clave}, MIN(CAST(MINUTOS AS INTEGER), {TOPE_HISTOGRAMA}) AS MINUTO, COUNT(*)
+        FROM kpi_contenedor WHERE {filtro} AND MINUTOS IS NOT NULL GROUP BY {clave}, MINUTO""", etiquetas)
+
+def cargar(ruta=ARCHIVO_HISTORICO):
+    """(rotaciones, resumen, histograma) completos; son tablas chicas, se filtran en pandas."""
+    con = conectar(ruta)
+    try:
+        tablas = [pd.read_sql_query(f"SELECT * FROM {t}", con) for t in ("rotaciones", "kpi_resumen", "kpi_histograma")]
+    finally: con.close()
+    for t in tablas[1:]: t["DIA"] = pd.to_datetime(t["DIA"])
+    return tuple(tablas)
+
+def agregar(resumen, por):
+    """Suma el resumen al nivel `por` y agrega % de cumplimiento y minutos promedio."""
+    g = resumen.groupby(por, observed=True)[["ACTIVOS", "CUMPLEN", "VERDES", "AMARILLOS", "ROJOS", "SUMA_MINUTOS", "CON_MINUTOS"]].sum()
+    g["PCT_CUMPLE"] = g["CUMPLEN"] / g["ACTIVOS"] * 100
+    g["PROM_MINUTOS"] = g["SUMA_MINUTOS"] / g["CON_MINUTOS"].replace(0, np.nan)
+    return g.reset_index()
+
+def percentiles(histograma, por, niveles=(50, 90)):
+    """Percentiles de minutos (resolución de 1 minuto) a partir del histograma, al nivel `por`."""
+    h = histograma.groupby(por + ["MINUTO"], observed=True)["N"].sum().reset_index().sort_values(por + ["MINUTO"])
+    acumulado = h.groupby(por, observed=True)["N"].cumsum()
+    total = h.groupby(por, observed=True)["N"].transform("sum")
+    resultado = h[por].drop_duplicates().set_index(por)
+    for p in niveles:
+        # Primer tramo donde el acumulado alcanza el p% del total
+        alcanzado = h[acumulado >= total * p / 100]
+        resultado[f"P{p}"] = alcanzado.groupby(por, observed=True)["MINUTO"].first()
+    return resultado.reset_index()
+
+def con_periodo(tabla, periodo):
+    """Agrega la columna PERIODO (inicio del día, semana o mes de DIA)."""
+    tabla = tabla.copy()
+    tabla["PERIODO"] = tabla["DIA"].dt.to_period(PERIODOS[periodo]).dt.start_time
+    return tabla
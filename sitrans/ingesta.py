@@ -0,0 +1,291 @@
+"""Lectura de reportes y archivos Monitor.
+
+Sin dependencias de Streamlit para que los archivos se puedan parsear en
+procesos separados.
+"""
+import io
+import os
+import re
+import hashlib
+import itertools
+import pickle
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+FILAS_METADATOS = 20  # Filas iniciales donde se buscan Nave / Rotación / Fecha
+
+# --- ESQUEMA DE COLUMNAS ---
+# Nombres ya normalizados (strip + mayúsculas)
+COLS_SENSORES = ['SENSOR1_TMP', 'SENSOR2_TMP', 'SENSOR3_TMP', 'SENSOR4_TMP']
+COLS_FECHA = ["TIME_IN", "CONEXIÓN", "SOLICITUD DESCONEXIÓN", "DESCONECCIÓN", "TIME_LOAD", "CONEXIÓN ONBOARD"]
+# Otras formas de escribir una columna -> nombre con que la usan los KPI
+ALIAS_COLUMNAS = {"DESCONEXIÓN": "DESCONECCIÓN"}
+# Columnas que pueden venir repetidas (X, X.1, ...): se funden en una, ganando la primera con dato
+COLS_COALESCER = COLS_SENSORES + ["DESCONECCIÓN"]
+# Lo único del Monitor que se usa (clasificación reefer y fechas); el resto no se lee
+COLS_MONITOR = ['UNIDAD'] + COLS_SENSORES + COLS_FECHA
+
+_SUFIJO_DUPLICADO = re.compile(r"\.\d+$")
+
+def nombre_columna(nombre):
+    """Nombre normalizado de un encabezado: strip, mayúsculas y alias."""
+    nombre = str(nombre).strip().upper()
+    return ALIAS_COLUMNAS.get(nombre, nombre)
+
+def normalizar_columnas(nombres):
+    """Normaliza los encabezados en una pasada; los repetidos quedan como X, X.1, X.2..."""
+    resultado, usados, repeticiones = [], set(), {}
+    for nombre in map(nombre_columna, nombres):
+        final = nombre
+        while final in usados:
+            repeticiones[nombre] = repeticiones.get(nombre, 0) + 1
+            final = f"{nombre}.{repeticiones[nombre]}"
+        usados.add(final)
+        resultado.append(final)
+    return resultado
+
+def coalescer_columnas(df, columnas=COLS_COALESCER):
+    """Funde X.1, X.2... en X (la primera con dato gana) y elimina las copias."""
+    for col_base in columnas:
+        copias = [c for c in df.columns if c != col_base and _SUFIJO_DUPLICADO.sub("", c) == col_base]
+        if not copias: continue
+        if col_base not in df.columns: df = df.rename(columns={copias.pop(0): col_base})
+        for col in copias: df[col_base] = df[col_base].fillna(df[col])
+        df = df.drop(columns=copias)
+    return df
+
+def iterar_filas_excel(file):
+    """Recorre una sola vez las filas de la primera hoja como tuplas de valores."""
+    file.seek(0)
+    firma = file.read(4)
+    file.seek(0)
+    if firma == b"PK\x03\x04":
+        # .xlsx: openpyxl en modo streaming, sin construir DataFrames intermedios.
+        # Se importa acá y no al cargar el módulo: la app arranca sin pagarlo
+        import openpyxl
+        wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            hoja = wb.worksheets[0]
+            # Algunos exportadores escriben un <dimension> viejo (p. ej. "A1"); en read_only
+            # openpyxl lo respeta y cortaría la hoja. pandas hace lo mismo en su lector.
+            hoja.reset_dimensions()
+            yield from hoja.iter_rows(values_only=True)
+        finally: wb.close()
+    else:
+        # .xls: xlrd no permite streaming, se lee una única vez
+        df_raw = pd.read_excel(file, header=None)
+        yield from df_raw.astype(object).where(df_raw.notna(), None).itertuples(index=False, name=None)
+
+def leer_metadatos_fila(metadatos, valores):
+    fila = [str(x).strip().upper() for x in valores]
+    for j, val in enumerate(fila):
+        if "NAVE" in val:
+            if ":" in val and len(val.split(":")) > 1: metadatos["Nave"] = val.split(":")[1].strip()
+            elif j+1 < len(fila): metadatos["Nave"] = fila[j+1]
+        if any(x in val for x in ["ROTACION", "ROTACIÓN", "VIAJE"]):
+            if ":" in val and len(val.split(":")) > 1: metadatos["Rotación"] = val.split(":")[1].strip()
+            elif j+1 < len(fila): metadatos["Rotación"] = fila[j+1]
+
+def extraer_metadatos(filas_iniciales):
+    """Nave / Rotación / Fecha a partir de las primeras FILAS_METADATOS filas."""
+    metadatos = {"Nave": "---", "Rotación": "Indefinida", "Fecha": "---"}
+    textos = []
+    for fila in filas_iniciales:
+        valores = [x for x in fila if pd.notna(x)]
+        textos.extend(str(x) for x in valores)
+        leer_metadatos_fila(metadatos, valores)
+
+    texto = " ".join(textos).upper()
+    match_fecha = re.search(r'(\d{2}[/-]\d{2}[/-]\d{4}\s+\d{1,2}:\d{2})', texto)
+    if match_fecha: metadatos["Fecha"] = match_fecha.group(1)
+    else:
+        match_solo = re.search(r'(\d{2}[/-]\d{2}[/-]\d{4})', texto)
+        if match_solo: metadatos["Fecha"] = match_solo.group(1)
+    return metadatos
+
+def leer_metadatos_reporte(file):
+    """Solo los metadatos del reporte, sin recorrer los datos (para el índice de rotaciones)."""
+    filas = iterar_filas_excel(file)
+    try: return extraer_metadatos(itertools.islice(filas, FILAS_METADATOS))
+    finally: filas.close()
+
+def cargar_reporte(file, palabra_clave="CONTENEDOR"):
+    """Abre el reporte una sola vez: metadatos, fila de encabezado y datos salen del mismo recorrido."""
+    return armar_reporte(iterar_filas_excel(file), palabra_clave)
+
+def armar_reporte(filas, palabra_clave="CONTENEDOR"):
+    """Detecta metadatos y encabezado sobre un iterador de filas y arma el DataFrame del reporte."""
+    iniciales, encabezado, datos = [], None, []
+    for i, fila in enumerate(filas):
+        if i < FILAS_METADATOS: iniciales.append(fila)
+        if encabezado is None:
+            if palabra_clave in [str(v).strip().upper() for v in fila]: encabezado = fila
+        elif any(v is not None for v in fila):
+            datos.append(fila)
+
+    metadatos = extraer_metadatos(iniciales)
+    if encabezado is None: return metadatos, None
+
+    ancho = len(encabezado)
+    while ancho and encabezado[ancho-1] is None: ancho -= 1
+    cols = normalizar_columnas(f"Unnamed: {k}" if v is None else v for k, v in enumerate(encabezado[:ancho]))
+
+    filas = [tuple(fila[:ancho]) + (None,) * (ancho - len(fila)) for fila in datos]
+    df = pd.DataFrame.from_records(filas, columns=cols)
+    vacias = df.columns[df.isna().all()]
+    df[vacias] = df[vacias].astype(float)
+    return metadatos, coalescer_columnas(df)
+
+def clasificar_reefer(df):
+    """CT si cualquier sensor de temperatura tiene un valor no vacío, General en otro caso."""
+    es_ct = np.zeros(len(df), dtype=bool)
+    for col in COLS_SENSORES:
+        if col not in df.columns: continue
+        valores = df[col]
+        con_valor = valores.notna().to_numpy()
+        if not pd.api.types.is_numeric_dtype(valores):
+            # Solo los textos pueden quedar vacíos tras el strip
+            con_valor &= (valores.astype(str).str.strip() != "").to_numpy()
+        es_ct |= con_valor
+    return pd.Series(np.where(es_ct, "CT", "General"), index=df.index)
+
+def _columna_monitor(nombre):
+    # pandas ya numeró los repetidos (X.1): se compara el nombre base
+    return nombre_columna(_SUFIJO_DUPLICADO.sub("", str(nombre))) in COLS_MONITOR
+
+def leer_monitor(file):
+    """Lee del Monitor (encabezado en la fila 4) solo las columnas de COLS_MONITOR."""
+    file.seek(0)
+    df = pd.read_excel(file, header=3, usecols=_columna_monitor)
+    df.columns = normalizar_columnas(df.columns)
+    df = coalescer_columnas(df)
+    df = df[[c for c in df.columns if c in COLS_MONITOR]]  # Repetidos tras normalizar: gana el primero
+    if 'UNIDAD' not in df.columns:
+        raise ValueError("No se encontró la columna 'UNIDAD' en fila 4.")
+    df = df[df['UNIDAD'].notna()]
+    return df.drop_duplicates(subset=['UNIDAD'])
+
+# --- CACHÉ DE PARSEO EN DISCO ---
+VERSION_PARSER = 3  # Subir al cambiar la lectura de archivos: invalida la caché
+CARPETA_CACHE = ".cache_parseo"
+LIMITE_CACHE_BYTES = 512 * 1024 * 1024
+
+def ruta_cache(funcion, contenido):
+    h = hashlib.blake2b(contenido, digest_size=20)
+    h.update(f"{funcion.__name__}:{VERSION_PARSER}".encode())
+    return os.path.join(CARPETA_CACHE, h.hexdigest() + ".pkl")
+
+def leer_cache(ruta):
+    try:
+        with open(ruta, "rb") as f: resultado = pickle.load(f)
+        os.utime(ruta)  # Marca de uso para el desalojo LRU
+        return resultado
+    except Exception: return None
+
+def guardar_cache(ruta, resultado):
+    try:
+        os.makedirs(CARPETA_CACHE, exist_ok=True)
+        tmp = f"{ruta}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f: pickle.dump(resultado, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, ruta)
+    except Exception: pass
+
+def podar_cache(limite=LIMITE_CACHE_BYTES):
+    """Elimina las entradas usadas hace más tiempo hasta quedar bajo el límite."""
+    try:
+        with os.scandir(CARPETA_CACHE) as it:
+            entradas = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in it if e.name.endswith(".pkl")]
+    except OSError: return
+    total = sum(tam for _, tam, _ in entradas)
+    for _, tam, ruta in sorted(entradas):
+        if total <= limite: break
+        try:
+            os.remove(ruta)
+            total -= tam
+        except OSError: pass
+
+# --- PARSEO PARALELO ---
+_POOL = None
+_LOCK_POOL = threading.Lock()  # La precarga en segundo plano también usa el pool
+
+def _pool():
+    # Pool persistente: los workers se crean una vez por proceso y se reutilizan entre reruns
+    global _POOL
+    with _LOCK_POOL:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=os.cpu_count() or 1, mp_context=multiprocessing.get_context("spawn"))
+        return _POOL
+
+def en_memoria(nombre, contenido):
+    """Archivo en memoria con nombre, como los que entrega st.file_uploader."""
+    archivo = io.BytesIO(contenido)
+    archivo.name = nombre
+    return archivo
+
+def _ejecutar(funcion, nombre, contenido):
+    return funcion(en_memoria(nombre, contenido))
+
+def _ejecutar_seguro(funcion, nombre, contenido):
+    try: return _ejecutar(funcion, nombre, contenido), None
+    except Exception as e: return None, str(e)
+
+def _trabajo(funcion, archivo):
+    # getvalue() no mueve la posición: el mismo archivo puede leerse desde otro hilo
+    if hasattr(archivo, "getvalue"): contenido = archivo.getvalue()
+    else:
+        archivo.seek(0)
+        contenido = archivo.read()
+        archivo.seek(0)
+    return funcion, getattr(archivo, "name", ""), contenido
+
+def parsear_a_medida(tareas):
+    """Como parsear_en_paralelo, pero entrega (posición, resultado, error) a medida que
+    termina cada archivo. Cerrar el generador (p. ej. al cancelar) descarta los que no
+    alcanzaron a empezar."""
+    global _POOL
+    trabajos = [_trabajo(funcion, archivo) for funcion, archivo in tareas]
+    rutas = [ruta_cache(funcion, contenido) for funcion, _, contenido in trabajos]
+    pendientes = []
+    for i, ruta in enumerate(rutas):
+        en_cache = leer_cache(ruta)
+        if en_cache is None: pendientes.append(i)
+        else: yield i, en_cache, None
+    if not pendientes: return
+
+    futuros = {}
+    try:
+        if len(pendientes) > 1:
+            try: futuros = {_pool().submit(_ejecutar, *trabajos[i]): i for i in pendientes}
+            except (BrokenProcessPool, RuntimeError, OSError): _POOL = None
+        # Un solo archivo (o sin pool): en este proceso, sin pagar el envío
+        completados = ((futuros[f], f) for f in as_completed(futuros)) if futuros else ((i, None) for i in pendientes)
+        for i, futuro in completados:
+            if futuro is None: resultado, error = _ejecutar_seguro(*trabajos[i])
+            else:
+                try: resultado, error = futuro.result(), None
+                except BrokenProcessPool:
+                    _POOL = None
+                    resultado, error = _ejecutar_seguro(*trabajos[i])
+                except Exception as e: resultado, error = None, str(e)
+            if error is None: guardar_cache(rutas[i], resultado)
+            yield i, resultado, error
+    finally:
+        for futuro in futuros: futuro.cancel()
+        podar_cache()
+
+def parsear_en_paralelo(tareas):
+    """Ejecuta [(funcion, archivo), ...] en un pool de procesos.
+
+    Devuelve [(resultado, error), ...] en el mismo orden de `tareas`; un archivo
+    con error no detiene al resto del lote. Los archivos ya vistos (mismo
+    contenido) salen de la caché en disco sin volver a parsearse.
+    """
+    resultados = [None] * len(tareas)
+    for i, resultado, error in parsear_a_medida(tareas):
+        resultados[i] = (resultado, error)
+    return resultados
@@ -0,0 +1,167 @@
+"""Cálculo de estados, minutos, semáforo y cumplimiento por proceso.
+
+Sin dependencias de Streamlit. El cálculo se divide en dos pasos:
+`calcular_estados` hace todo lo que no depende de la hora actual (una vez
+por dataset, todas las rotaciones juntas) y `aplicar_ahora` solo actualiza
+los minutos de los contenedores en estado "Pendiente".
+"""
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURACIÓN DE UMBRALES SEMÁFORO (MINUTOS) ---
+UMBRALES_SEMAFORO = {
+    "Conexión a Stacking":       [15, 30],
+    "Desconexión para Embarque": [15, 30],
+    "Conexión OnBoard":          [15, 30]
+}
+
+# --- LÍMITES DE CUMPLIMIENTO (MINUTOS) ---
+LIMITE_CUMPLE_TIPO = {"CT": 30, "General": 60}
+LIMITE_CUMPLE_ONBOARD = 30
+
+PAREJAS = {
+    "Conexión a Stacking": {"Fin": "CONEXIÓN", "Ini": "TIME_IN"},
+    "Desconexión para Embarque": {"Fin": "DESCONECCIÓN", "Ini": "SOLICITUD DESCONEXIÓN"},
+    "Conexión OnBoard": {"Fin": "CONEXIÓN ONBOARD", "Ini": "TIME_LOAD"}
+}
+
+MAPA_ESTADOS = {
+    "Conexión a Stacking": "Conectado",
+    "Desconexión para Embarque": "Desconectado",
+    "Conexión OnBoard": "Conectado a Bordo"
+}
+
+COLORES_SEMAFORO = {'Verde': '#d4edda', 'Amarillo': '#fff3cd', 'Rojo': '#f8d7da'}
+
+# --- TIPOS COMPACTOS ---
+# Etiquetas repetidas en cada fila como categóricas de categorías fijas; minutos en float32
+SEMAFOROS = pd.CategoricalDtype(['Verde', 'Amarillo', 'Rojo'])
+COLORES = pd.CategoricalDtype([''] + list(COLORES_SEMAFORO.values()))
+TIPO_MINUTOS = np.float32
+
+def tipo_estados(proceso):
+    return pd.CategoricalDtype([MAPA_ESTADOS[proceso], "Pendiente", "Sin Solicitud"])
+
+RESOLUCION_AHORA = "10s"  # Granularidad con la que avanza "ahora" entre reruns
+
+FILAS_POR_PAGINA = 200  # Filas de la grilla que se estilizan y envían al navegador
+
+def formatear_duraciones(minutos):
+    """Versión vectorizada de H:MM:SS; los nulos quedan como texto vacío."""
+    minutos = pd.to_numeric(minutos, errors='coerce')
+    validos = minutos.notna()
+    segundos = (minutos[validos].clip(lower=0) * 60).astype(np.int64)
+    texto = (
+        (segundos // 3600).astype(str) + ":" +
+        ((segundos % 3600) // 60).astype(str).str.zfill(2) + ":" +
+        (segundos % 60).astype(str).str.zfill(2)
+    )
+    return texto.reindex(minutos.index, fill_value="")
+
+def semaforo(minutos, proceso):
+    limite_verde, limite_amarillo = UMBRALES_SEMAFORO[proceso]
+    cond_sem = [
+        minutos <= limite_verde,
+        (minutos > limite_verde) & (minutos <= limite_amarillo),
+        minutos > limite_amarillo
+    ]
+    return np.select(cond_sem, ['Verde', 'Amarillo', 'Rojo'], default='Rojo')
+
+def color_semaforo(df, proceso):
+    """Color de fondo de la grilla: solo para contenedores activos con minutos válidos."""
+    minutos = df[f"Min_{proceso}"]
+    activos = df[f"Estado_{proceso}"].isin([MAPA_ESTADOS[proceso], "Pendiente"]) & minutos.notna() & (minutos >= 0)
+    color = df[f"Semaforo_{proceso}"].astype(object).map(COLORES_SEMAFORO).where(activos, "")
+    return color.astype(COLORES)
+
+def cumple(minutos, tipo, proceso):
+    if proceso == "Conexión OnBoard":
+        return np.asarray(minutos <= LIMITE_CUMPLE_ONBOARD)
+    cond_cumple = [(tipo == t) & (minutos <= limite) for t, limite in LIMITE_CUMPLE_TIPO.items()]
+    return np.select(cond_cumple, [True] * len(cond_cumple), default=False).astype(bool)
+
+def calcular_estados(df):
+    """Estados, minutos de procesos terminados, semáforo y cumplimiento (parte fija en el tiempo).
+
+    Agrega las columnas sobre el mismo `df` (el pipeline lo arma recién, no hace falta copiarlo).
+    Los minutos de los "Pendiente" quedan en NaN hasta llamar a `aplicar_ahora`.
+    """
+    tipo = df['TIPO'] if 'TIPO' in df.columns else pd.Series('General', index=df.index)
+    for proceso, cols in PAREJAS.items():
+        label_fin = MAPA_ESTADOS[proceso]
+        col_stat, col_min = f"Estado_{proceso}", f"Min_{proceso}"
+        estados = np.full(len(df), "Sin Solicitud", dtype=object)
+        minutos = np.zeros(len(df))
+        ver_tiempo = pd.Series("", index=df.index, dtype=object)
+
+        if cols["Ini"] in df.columns and cols["Fin"] in df.columns:
+            ini, fin = df[cols["Ini"]], df[cols["Fin"]]
+            cond = [ini.notna() & fin.notna(), ini.notna() & fin.isna()]
+            estados = np.select(cond, [label_fin, "Pendiente"], default="Sin Solicitud")
+
+            mask_fin = estados == label_fin
+            diff_minutos = ((fin[mask_fin] - ini[mask_fin]).dt.total_seconds() / 60).clip(lower=0)
+            minutos[mask_fin] = diff_minutos
+            minutos[estados == "Pendiente"] = np.nan
+            # H:MM:SS desde los minutos en float64, antes de pasarlos a float32
+            ver_tiempo[mask_fin] = formatear_duraciones(diff_minutos)
+
+        df[col_stat] = pd.Categorical(estados, dtype=tipo_estados(proceso))
+        df[col_min] = minutos.astype(TIPO_MINUTOS)
+        df[f"Ver_Tiempo_{proceso}"] = ver_tiempo
+        df[f"Ver_Trans_{proceso}"] = TIPO_MINUTOS(0)
+        df[f"Semaforo_{proceso}"] = pd.Categorical(semaforo(minutos, proceso), dtype=SEMAFOROS)
+        df[f"Cumple_{proceso}"] = cumple(pd.Series(minutos, index=df.index), tipo, proceso)
+        df[f"Color_{proceso}"] = color_semaforo(df, proceso)
+    return df
+
+def aplicar_ahora(df, ahora):
+    """Completa minutos, semáforo, color y cumplimiento de los contenedores "Pendiente" según `ahora`.
+
+    Modifica `df`: se le pasa la selección de una rotación, que ya es un frame propio.
+    """
+    tipo = df['TIPO'] if 'TIPO' in df.columns else pd.Series('General', index=df.index)
+    for proceso, cols in PAREJAS.items():
+        col_min = f"Min_{proceso}"
+        mask_pen = (df[f"Estado_{proceso}"] == "Pendiente").to_numpy()
+        if not mask_pen.any(): continue
+
+        minutos = ((ahora - df.loc[mask_pen, cols["Ini"]]).dt.total_seconds() / 60).clip(lower=0)
+        df.loc[mask_pen, col_min] = minutos.astype(TIPO_MINUTOS)
+        df.loc[mask_pen, f"Ver_Trans_{proceso}"] = minutos.astype(TIPO_MINUTOS)
+        sem = semaforo(minutos, proceso)
+        df.loc[mask_pen, f"Semaforo_{proceso}"] = sem
+        df.loc[mask_pen, f"Color_{proceso}"] = pd.Series(sem).map(COLORES_SEMAFORO).to_numpy()
+        df.loc[mask_pen, f"Cumple_{proceso}"] = cumple(minutos, tipo[mask_pen], proceso)
+    return df
+
+def resumen_proceso(df, proceso):
+    """Conteo de semáforo, % de cumplimiento y promedios sobre los contenedores activos."""
+    activos = df[f"Estado_{proceso}"].isin([MAPA_ESTADOS[proceso], "Pendiente"])
+    if not activos.any(): return None
+
+    minutos = df.loc[activos, f"Min_{proceso}"].astype(float)  # Promedios acumulados en float64
+    ok = df.loc[activos, f"Cumple_{proceso}"].astype(bool)
+    tipo = df.loc[activos, 'TIPO']
+    return {
+        "conteos": df.loc[activos, f"Semaforo_{proceso}"].value_counts().loc[lambda c: c > 0],
+        "pct": ok.mean() * 100,
+        "prom_global": minutos.mean(),
+        "prom_ct": minutos[tipo == 'CT'].mean(),
+        "prom_gen": minutos[tipo == 'General'].mean(),
+        "rojos_total": int((~ok).sum()),
+        "rojos_ct": int(((tipo == 'CT') & ~ok).sum()),
+    }
+
+def tabla_grilla(df, proceso):
+    """Columnas visibles de la grilla y su tabla de estilos, armada por columnas (no por fila)."""
+    col_stat = f"Estado_{proceso}"
+    df_dsp = df[['CONTENEDOR', 'TIPO', f"Ver_Tiempo_{proceso}", col_stat, f"Ver_Trans_{proceso}"]]
+    df_dsp.columns = ['Contenedor', 'Tipo', 'Tiempo', 'Estado', 'Minutos Transcurridos']
+
+    color = df[f"Color_{proceso}"].astype(str)
+    css = ("background-color: " + color + "; font-weight: bold; color: #333;").where(color != "", "")
+    estilos = pd.DataFrame("", index=df_dsp.index, columns=df_dsp.columns)
+    estilos['Minutos Transcurridos'] = css
+    estilos['Tiempo'] = css.where(df[col_stat] == MAPA_ESTADOS[proceso], "")
+    return df_dsp, estilos
@@ -0,0 +1,323 @@
+"""Pipeline completo: lectura de archivos, maestro Monitor, cruce y estados KPI.
+
+Sin dependencias de Streamlit; lo usan tanto app.py como el modo batch (cli.py).
+Los problemas por archivo se devuelven como avisos (nivel, mensaje) en lugar
+de detener el lote.
+"""
+import datetime
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from sitrans import almacen, diagnostico, ingesta, kpi
+
+COLS_FECHA_POSIBLES = ingesta.COLS_FECHA
+
+# Formatos de texto candidatos, siempre día primero como en los reportes
+FORMATOS_FECHA = ["%d/%m/%Y %H:%M", "%d/%m/%Y %H:%M:%S", "%d-%m-%Y %H:%M", "%d-%m-%Y %H:%M:%S",
+                  "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d"]
+MUESTRA_FORMATO = 200
+# Seriales de Excel plausibles (1954-2119); fuera de rango se consideran dato inválido
+RANGO_SERIAL_EXCEL = (20000, 80000)
+
+# --- POLÍTICA DE TIPOS ---
+# Etiquetas que se repiten en cada fila (y el ID, que se repite entre rotaciones): siempre categóricas
+COLS_CATEGORICAS = ["CONTENEDOR", "ROTACION_DETECTADA", "NAVE_DETECTADA", "FECHA_CONSULTA", "ROTACION_LABEL", "TIPO"]
+# Otras columnas de texto pasan a categóricas si tienen a lo más esta fracción de valores distintos
+FRACCION_CATEGORICA = 0.5
+
+def _upsert_monitores(con, dfs_monitor):
+    """Integra al maestro los monitores ya parseados, en el orden de carga. Devuelve avisos.
+
+    El lote va completo bajo el bloqueo de escritura, así no se intercala con el de otra sesión.
+    """
+    avisos = []
+    with almacen.BLOQUEO_ESCRITURA:
+        for nombre, df_nuevo in dfs_monitor:
+            with diagnostico.etapa("upsert_maestro", len(df_nuevo)) as m:
+                try:
+                    almacen.upsert_maestro(con, df_nuevo.set_index('UNIDAD'))
+                    m["filas_salida"] = len(df_nuevo)
+                except Exception as e:
+                    avisos.append(("error", f"Error procesando archivo {nombre}: {e}"))
+    return avisos
+
+def procesar_batch_monitores(dfs_monitor, unidades=None, ruta_maestro=almacen.ARCHIVO_MAESTRO):
+    """Integra al maestro los monitores ya parseados y lee de vuelta las `unidades` pedidas.
+
+    Devuelve (df_maestro o None, avisos).
+    """
+    con = almacen.conectar_maestro(ruta_maestro)
+    try:
+        avisos = _upsert_monitores(con, dfs_monitor)
+
+        # Solo se leen las unidades referenciadas por los reportes
+        with diagnostico.etapa("carga_maestro", None if unidades is None else len(unidades)) as m:
+            df_maestro = almacen.cargar_maestro(con, unidades)
+            m["filas_salida"] = len(df_maestro)
+    finally:
+        con.close()
+
+    if df_maestro.empty: return None, avisos
+    return df_maestro, avisos
+
+def _parsear_lote(files_rep_list, files_mon_list):
+    """Parsea reportes y monitores juntos en paralelo; los resultados vuelven en orden de carga.
+
+    Devuelve (reportes preparados, [(nombre, df_monitor)], avisos).
+    """
+    tareas = [(ingesta.cargar_reporte, f) for f in files_rep_list] + [(ingesta.leer_monitor, f) for f in files_mon_list]
+    with diagnostico.etapa("parseo", len(tareas)) as m:
+        resultados = ingesta.parsear_en_paralelo(tareas)
+        m["filas_salida"] = sum(_filas(r) for r, error in resultados if not error)
+    res_rep, res_mon = resultados[:len(files_rep_list)], resultados[len(files_rep_list):]
+
+    errores = []
+    lista_dfs = []
+    for archivo_rep, (resultado, error) in zip(files_rep_list, res_rep):
+        if error:
+            errores.append((archivo_rep.name, error))
+            continue
+        meta, df_ind = resultado
+        if df_ind is None:
+            errores.append((archivo_rep.name, "No se encontró la columna 'CONTENEDOR'."))
+            continue
+        lista_dfs.append(preparar_reporte(meta, df_ind))
+
+    dfs_mon = []
+    for archivo_mon, (df_mon, error) in zip(files_mon_list, res_mon):
+        if error: errores.append((archivo_mon.name, error))
+        else: dfs_mon.append((archivo_mon.name, df_mon))
+
+    avisos = [("error", f"Error procesando archivo {nombre}: {error}") for nombre, error in errores]
+    return lista_dfs, dfs_mon, avisos
+
+def _armar_master(lista_dfs, dfs_mon, avisos, ruta_maestro, parcial=False):
+    """Cruce con el maestro, fechas, tipos y estados KPI fijos sobre los reportes ya preparados."""
+    with diagnostico.etapa("concat_reportes", sum(len(d) for d in lista_dfs)) as m:
+        df_rep = pd.concat(lista_dfs, ignore_index=True)
+        m["filas_salida"] = len(df_rep)
+    
+    df_mon_data, avisos_mon = procesar_batch_monitores(dfs_mon, df_rep['CONTENEDOR'].dropna().unique(), ruta_maestro)
+    avisos += avisos_mon
+    if df_mon_data is None and parcial: df_mon_data = pd.DataFrame({'UNIDAD': pd.Series(dtype=object)})
+    elif df_mon_data is None: 
+        avisos.append(("warning", "No se pudo procesar ningún archivo monitor válido."))
+        return None, avisos
+    
+    with diagnostico.etapa("cruce_monitor", len(df_rep)) as m:
+        df_master = cruzar_con_monitor(df_rep, df_mon_data)
+        m["filas_salida"] = len(df_master)
+    with diagnostico.etapa("fechas", len(df_master)) as m:
+        df_master, perdidas = convertir_fechas(df_master)
+        m["filas_salida"] = len(df_master)
+    for col, n in perdidas.items():
+        avisos.append(("warning", f"{col}: {n} valores no se reconocieron como fecha y quedaron vacíos."))
+
+    # --- CREAR ETIQUETA COMBINADA (ROTACIÓN - NAVE) ---
+    df_master['ROTACION_LABEL'] = df_master['ROTACION_DETECTADA'].astype(str) + " - " + df_master['NAVE_DETECTADA'].astype(str)
+    df_master = compactar_tipos(df_master)
+
+    # Estados y minutos de procesos terminados: una sola pasada para todas las rotaciones
+    with diagnostico.etapa("estados_kpi", len(df_master)) as m:
+        df_master = kpi.calcular_estados(df_master)
+        m["filas_salida"] = len(df_master)
+    df_master.attrs['id_dataset'] = uuid.uuid4().hex
+    # El cruce (left, UNIDAD única) conserva el orden: cada reporte es un tramo contiguo de filas
+    if len(df_master) == len(df_rep):
+        rangos, inicio = {}, 0
+        for d in lista_dfs:
+            if len(d): rangos.setdefault(etiqueta_rotacion(d.iloc[0]), []).append((inicio, inicio + len(d)))
+            inicio += len(d)
+        df_master.attrs['rangos_rotacion'] = rangos
+    return df_master, avisos
+
+def procesar_datos_completos(files_rep_list, files_mon_list, ruta_maestro=almacen.ARCHIVO_MAESTRO):
+    """Devuelve (df_master o None, avisos) con los estados KPI fijos ya calculados."""
+    lista_dfs, dfs_mon, avisos = _parsear_lote(files_rep_list, files_mon_list)
+    if not lista_dfs: return None, avisos
+    return _armar_master(lista_dfs, dfs_mon, avisos, ruta_maestro)
+
+# --- CARGA POR ROTACIÓN ---
+def etiqueta_rotacion(meta):
+    """ROTACION_LABEL a partir de los metadatos (o de una fila ya preparada)."""
+    if 'ROTACION_DETECTADA' in meta: return f"{meta['ROTACION_DETECTADA']} - {meta['NAVE_DETECTADA']}"
+    return f"{meta['Rotación']} - {meta['Nave']}"
+
+def indexar_rotaciones(files_rep_list):
+    """Índice ROTACION_LABEL → posiciones en `files_rep_list`, leyendo solo los metadatos.
+
+    Devuelve (indice, avisos); las etiquetas quedan en orden de carga.
+    """
+    tareas = [(ingesta.leer_metadatos_reporte, f) for f in files_rep_list]
+    with diagnostico.etapa("indice_rotaciones", len(tareas)) as m:
+        resultados = ingesta.parsear_en_paralelo(tareas)
+        indice, avisos = {}, []
+        for pos, (archivo, (meta, error)) in enumerate(zip(files_rep_list, resultados)):
+            if error: avisos.append(("error", f"Error procesando archivo {archivo.name}: {error}"))
+            else: indice.setdefault(etiqueta_rotacion(meta), []).append(pos)
+        m["filas_salida"] = len(indice)
+    return indice, avisos
+
+def progreso_inicial(files_mon_list):
+    return [{"archivo": f.name, "estado": "En cola", "filas": None, "error": None} for f in files_mon_list]
+
+def integrar_monitores(files_mon_list, ruta_maestro=almacen.ARCHIVO_MAESTRO, progreso=None, cancelar=None):
+    """Parsea los monitores y los integra al maestro a medida que se leen, sin leerlo de vuelta.
+
+    Cada archivo se integra apenas él y todos los anteriores están leídos, así el orden
+    de carga se respeta y el maestro va quedando al día mientras se lee el resto.
+    `progreso` (ver progreso_inicial) se actualiza archivo por archivo; si se activa
+    `cancelar` (threading.Event), lo que no alcanzó a integrarse queda "Cancelado".
+
+    Devuelve (avisos, unidades leídas), para saber qué rotaciones quedaron desactualizadas.
+    """
+    progreso = progreso_inicial(files_mon_list) if progreso is None else progreso
+    avisos, unidades, listos, siguiente = [], set(), {}, 0
+    tareas = [(ingesta.leer_monitor, f) for f in files_mon_list]
+    con = almacen.conectar_maestro(ruta_maestro)
+    lecturas = ingesta.parsear_a_medida(tareas)
+    try:
+        with diagnostico.etapa("parseo", len(tareas)) as m:
+            m["filas_salida"] = 0
+            for i, df_mon, error in lecturas:
+                if error:
+                    progreso[i].update(estado="Error", error=error)
+                    avisos.append(("error", f"Error procesando archivo {files_mon_list[i].name}: {error}"))
+                else:
+                    progreso[i].update(estado="Leído", filas=len(df_mon))
+                    m["filas_salida"] += len(df_mon)
+                listos[i] = df_mon
+                while siguiente in listos:
+                    df_mon = listos.pop(siguiente)
+                    if df_mon is not None:
+                        avisos_mon = _upsert_monitores(con, [(files_mon_list[siguiente].name, df_mon)])
+                        avisos += avisos_mon
+                        if avisos_mon: progreso[siguiente].update(estado="Error", error=avisos_mon[0][1])
+                        else:
+                            progreso[siguiente]["estado"] = "Integrado"
+                            unidades.update(df_mon['UNIDAD'].astype(str))
+                    siguiente += 1
+                if cancelar is not None and cancelar.is_set(): break
+    finally:
+        lecturas.close()
+        con.close()
+    for p in progreso:
+        if p["estado"] in ("En cola", "Leído"): p["estado"] = "Cancelado"
+    return avisos, unidades
+
+def procesar_rotacion(files_rep_list, ruta_maestro=almacen.ARCHIVO_MAESTRO, parcial=False):
+    """Como procesar_datos_completos, pero solo con los reportes dados y el maestro ya integrado.
+
+    Con `parcial` (monitores todavía integrándose) se arma aunque el maestro aún no
+    tenga ninguno de sus contenedores.
+    """
+    lista_dfs, _, avisos = _parsear_lote(files_rep_list, [])
+    if not lista_dfs: return None, avisos
+    return _armar_master(lista_dfs, [], avisos, ruta_maestro, parcial)
+
+def _filas(resultado):
+    """Filas de un resultado de parseo: (meta, df) de reporte o df de monitor."""
+    df = resultado[1] if isinstance(resultado, tuple) else resultado
+    return 0 if df is None else len(df)
+
+def preparar_reporte(meta, df_ind):
+    """Quita filas vacías y de totales y agrega los metadatos del archivo."""
+    df_ind = df_ind[df_ind['CONTENEDOR'].notna()]
+    df_ind = df_ind[df_ind['CONTENEDOR'].astype(str).str.strip() != ""]
+    df_ind = df_ind[~df_ind['CONTENEDOR'].astype(str).str.contains("Total", case=False, na=False)]
+    df_ind['ROTACION_DETECTADA'] = meta['Rotación']
+    df_ind['NAVE_DETECTADA'] = meta['Nave']
+    df_ind['FECHA_CONSULTA'] = meta['Fecha']
+    return df_ind
+
+def cruzar_con_monitor(df_rep, df_mon_data):
+    df_master = pd.merge(df_rep, df_mon_data, left_on="CONTENEDOR", right_on="UNIDAD", how="left")
+    
+    if 'TIPO_CONTENEDOR' in df_master.columns:
+        df_master['TIPO'] = df_master['TIPO_CONTENEDOR'].fillna('General')
+    else:
+        df_master['TIPO'] = 'General'
+    return df_master
+
+def formato_dominante(textos):
+    """Formato de FORMATOS_FECHA que reconoce más valores de una muestra; None si ninguno."""
+    muestra = pd.Series(textos.unique()[:MUESTRA_FORMATO])
+    aciertos = {f: pd.to_datetime(muestra, format=f, errors='coerce').notna().sum() for f in FORMATOS_FECHA}
+    mejor = max(aciertos, key=aciertos.get)
+    return mejor if aciertos[mejor] else None
+
+def parsear_fechas(serie):
+    """Devuelve (serie datetime64, cantidad de valores con dato que quedaron NaT).
+
+    Los datetime nativos y los seriales de Excel se convierten sin pasar por
+    texto; los textos se leen con su formato dominante y solo lo que no calza
+    cae a la inferencia por elemento.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie): return serie, 0
+
+    valores = serie.astype(object)
+    resultado = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns]")
+    tipos = valores.map(type)
+    con_dato = valores.notna()
+
+    es_fecha = tipos.isin([datetime.datetime, pd.Timestamp, datetime.date])
+    if es_fecha.any(): resultado[es_fecha] = pd.to_datetime(valores[es_fecha])
+
+    es_num = tipos.isin([int, float, np.int64, np.float64]) & con_dato
+    if es_num.any():
+        serial = valores[es_num].astype(float)
+        serial = serial[serial.between(*RANGO_SERIAL_EXCEL)]
+        resultado[serial.index] = pd.to_datetime(serial, unit='D', origin='1899-12-30').dt.round('s')
+
+    es_txt = tipos == str
+    if es_txt.any():
+        # Cada texto distinto se parsea una sola vez: las horas se repiten mucho entre filas
+        textos = valores[es_txt]
+        unicos = pd.Series(pd.unique(textos))
+        limpios = unicos.str.strip()
+        formato = formato_dominante(limpios)
+        if formato: leidas = pd.to_datetime(limpios, format=formato, errors='coerce')
+        else: leidas = pd.Series(pd.NaT, index=limpios.index, dtype="datetime64[ns]")
+        fallidas = leidas.isna().to_numpy()
+        # Textos sin dígitos ("-", "N/A") son marcadores de vacío, no fechas perdidas
+        marcadores = np.zeros(len(limpios), dtype=bool)
+        marcadores[fallidas] = ~limpios[fallidas].str.contains(r"\d").to_numpy(dtype=bool)
+        resto = fallidas & ~marcadores
+        if resto.any(): leidas[resto] = pd.to_datetime(limpios[resto], format="mixed", dayfirst=True, errors='coerce')
+        resultado[es_txt] = textos.map(pd.Series(leidas.values, index=unicos.values))
+        if marcadores.any(): con_dato[textos.index[textos.isin(unicos[marcadores])]] = False
+
+    return resultado, int((con_dato & resultado.isna()).sum())
+
+def convertir_fechas(df):
+    """Devuelve (df, {columna: valores perdidos}) con las columnas de evento como datetime."""
+    perdidas = {}
+    for col in COLS_FECHA_POSIBLES:
+        if col in df.columns:
+            df[col], n = parsear_fechas(df[col])
+            if n: perdidas[col] = n
+    return df, perdidas
+
+def compactar_tipos(df):
+    """Aplica la política de tipos: texto repetido a categórico (sobre el mismo df)."""
+    for col in df.columns[df.dtypes == object]:
+        if col in COLS_FECHA_POSIBLES: continue
+        if col in COLS_CATEGORICAS or df[col].nunique() <= FRACCION_CATEGORICA * len(df):
+            df[col] = df[col].astype("category")
+    return df
+
+def kpis_rotacion(df_master, rotacion, ahora):
+    """Filas de una rotación con los "Pendiente" actualizados a `ahora`."""
+    with diagnostico.etapa("kpis_rotacion", len(df_master)) as m:
+        rangos = df_master.attrs.get('rangos_rotacion')
+        if rangos is not None:
+            filas = np.concatenate([np.arange(ini, fin) for ini, fin in rangos.get(rotacion, [])] or [np.array([], dtype=int)])
+        else: filas = np.flatnonzero((df_master['ROTACION_LABEL'] == rotacion).to_numpy())
+        # take() deja un frame propio sin marca de "copia de un slice": una sola copia por rotación
+        df = df_master.take(filas)
+        df.attrs.pop('rangos_rotacion', None)  # Los tramos son del frame completo, no de la selección
+        df = kpi.aplicar_ahora(df, ahora)
+        m["filas_salida"] = len(df)
+    return df
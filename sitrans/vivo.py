@@ -0,0 +1,116 @@
+"""Modo en vivo: vigila una carpeta e integra solo los archivos nuevos o modificados.
+
+La carpeta tiene dos subcarpetas, como las del modo batch:
+
+    <carpeta>/reportes/   reportes (.xls/.xlsx)
+    <carpeta>/monitores/  archivos Monitor (.xlsx)
+
+Los monitores nuevos se integran al maestro con el mismo upsert de siempre (en
+orden de fecha de modificación) y solo se rearman las rotaciones cuyos
+contenedores aparecen en ellos o cuyos reportes cambiaron. Sin sincronizar
+nada, refrescar los "Pendiente" es solo `kpi.aplicar_ahora`.
+"""
+import os
+import threading
+
+from sitrans import almacen, ingesta, pipeline
+
+SUBCARPETA_REPORTES = "reportes"
+SUBCARPETA_MONITORES = "monitores"
+EXTENSIONES = (".xls", ".xlsx")
+INTERVALO_SEG = 1  # Cada cuánto se revisa la carpeta
+
+def nuevo_estado(carpeta, ruta_maestro=almacen.ARCHIVO_MAESTRO):
+    return {
+        "carpeta": carpeta,
+        "ruta_maestro": ruta_maestro,
+        "lock": threading.RLock(),  # El estado se comparte entre sesiones
+        "vistos": {},        # ruta -> (mtime_ns, tamaño) ya integrado
+        "fallidos": {},      # ruta -> (mtime_ns, tamaño) que dio error; se reintenta si cambia
+        "etiquetas": {},     # ruta de reporte -> ROTACION_LABEL
+        "rotaciones": {},    # ROTACION_LABEL -> (df_master, avisos) ya armado
+        "avisos": [],        # Avisos de la última sincronización con cambios
+        "version": 0,        # Sube con cada cambio integrado
+    }
+
+def escanear(carpeta, subcarpeta):
+    """{ruta: (mtime_ns, tamaño)} de los workbooks de la subcarpeta, del más antiguo al más nuevo."""
+    base = os.path.join(carpeta, subcarpeta)
+    try: entradas = [e for e in os.scandir(base) if e.is_file() and e.name.lower().endswith(EXTENSIONES) and not e.name.startswith("~$")]
+    except OSError: return {}
+    firmas = {e.path: (e.stat().st_mtime_ns, e.stat().st_size) for e in entradas}
+    return dict(sorted(firmas.items(), key=lambda kv: kv[1][0]))
+
+def _abrir(ruta):
+    with open(ruta, "rb") as f: return ingesta.en_memoria(os.path.basename(ruta), f.read())
+
+def indice(estado):
+    """ROTACION_LABEL -> rutas de reporte, en orden de llegada."""
+    resultado = {}
+    for ruta, etiqueta in estado["etiquetas"].items():
+        resultado.setdefault(etiqueta, []).append(ruta)
+    return resultado
+
+def hay_monitores(estado):
+    base = os.path.join(estado["carpeta"], SUBCARPETA_MONITORES)
+    return any(os.path.dirname(r) == base for r in estado["vistos"])
+
+def sincronizar(estado):
+    """Integra lo nuevo de la carpeta; devuelve True si algo cambió.
+
+    Un archivo con error (p. ej. todavía copiándose) no se marca como visto y se
+    reintenta cuando cambie su fecha o tamaño.
+    """
+    with estado["lock"]:
+        vistos, fallidos, carpeta = estado["vistos"], estado["fallidos"], estado["carpeta"]
+        def pendientes(firmas): return {r: f for r, f in firmas.items() if vistos.get(r) != f and fallidos.get(r) != f}
+        nuevos_mon = pendientes(escanear(carpeta, SUBCARPETA_MONITORES))
+        actuales_rep = escanear(carpeta, SUBCARPETA_REPORTES)
+        nuevos_rep = pendientes(actuales_rep)
+        borrados = [r for r in estado["etiquetas"] if r not in actuales_rep]
+        if not nuevos_mon and not nuevos_rep and not borrados: return False
+
+        avisos, sucias = [], set()
+        for ruta in borrados:
+            sucias.add(estado["etiquetas"].pop(ruta))
+            vistos.pop(ruta, None)
+
+        # Varios monitores a la vez (p. ej. al partir): se parsean en paralelo y quedan en la caché
+        if len(nuevos_mon) > 1: ingesta.parsear_en_paralelo([(ingesta.leer_monitor, _abrir(r)) for r in nuevos_mon])
+        for ruta, firma in nuevos_mon.items():
+            avisos_mon, unidades = pipeline.integrar_monitores([_abrir(ruta)], estado["ruta_maestro"])
+            avisos += avisos_mon
+            if any(nivel == "error" for nivel, _ in avisos_mon):
+                fallidos[ruta] = firma
+                continue
+            vistos[ruta] = firma
+            # Solo se rearman las rotaciones que tienen alguno de estos contenedores
+            for etiqueta, (df, _) in estado["rotaciones"].items():
+                if df is None or df['CONTENEDOR'].astype(str).isin(unidades).any(): sucias.add(etiqueta)
+
+        if nuevos_rep:
+            rutas = list(nuevos_rep)
+            resultados = ingesta.parsear_en_paralelo([(ingesta.leer_metadatos_reporte, _abrir(r)) for r in rutas])
+            for ruta, (meta, error) in zip(rutas, resultados):
+                if error:
+                    avisos.append(("error", f"Error procesando archivo {os.path.basename(ruta)}: {error}"))
+                    fallidos[ruta] = nuevos_rep[ruta]
+                    continue
+                anterior = estado["etiquetas"].get(ruta)
+                if anterior is not None: sucias.add(anterior)
+                estado["etiquetas"][ruta] = pipeline.etiqueta_rotacion(meta)
+                sucias.add(estado["etiquetas"][ruta])
+                vistos[ruta] = nuevos_rep[ruta]
+
+        for etiqueta in sucias: estado["rotaciones"].pop(etiqueta, None)
+        estado["avisos"] = avisos
+        estado["version"] += 1
+        return True
+
+def rotacion(estado, etiqueta):
+    """(df_master, avisos) de una rotación; se arma solo si cambió desde la última vez."""
+    with estado["lock"]:
+        if etiqueta not in estado["rotaciones"]:
+            rutas = indice(estado).get(etiqueta, [])
+            estado["rotaciones"][etiqueta] = pipeline.procesar_rotacion([_abrir(r) for r in rutas], estado["ruta_maestro"])
+        return estado["rotaciones"][etiqueta]
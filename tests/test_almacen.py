@@ -0,0 +1,21 @@
+"""Maestro en memoria cuando no se puede escribir el archivo."""
+import pandas as pd
+
+from sitrans import almacen
+
+
+def test_sin_disco_las_conexiones_comparten_el_maestro(tmp_path):
+    ruta = str(tmp_path / "no_existe" / "maestro.db")  # Carpeta inexistente: no se puede crear
+    try:
+        con = almacen.conectar_maestro(ruta, str(tmp_path / "x.xlsx"))
+        try: almacen.upsert_maestro(con, pd.DataFrame({"UNIDAD": ["A"], "SENSOR1_TMP": [-18.0]}))
+        finally: con.close()
+        assert almacen.version_maestro(ruta) == 1
+
+        # Otra conexión (como la que arma las rotaciones) ve lo integrado
+        con = almacen.conectar_maestro(ruta, str(tmp_path / "x.xlsx"))
+        try: assert almacen.cargar_maestro(con, ["A"])['TIPO_CONTENEDOR'].tolist() == ["CT"]
+        finally: con.close()
+    finally:
+        assert almacen.borrar_historial(ruta, str(tmp_path / "x.xlsx"))
+    assert almacen.version_maestro(ruta) == 0
@@ -0,0 +1,63 @@
+"""Clasificación reefer (CT) vectorizada contra la lógica fila a fila original."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from sitrans import almacen, ingesta
+
+
+def es_reefer_ct(row):
+    # Lógica original (app.py antes de clasificar_reefer), aplicada con apply(axis=1)
+    es_ct = False
+    for col in ingesta.COLS_SENSORES:
+        if col in row and pd.notna(row[col]) and str(row[col]).strip() != "":
+            es_ct = True
+            break
+    return "CT" if es_ct else "General"
+
+
+def monitor_real():
+    """Sensores como llegan del Monitor y del maestro: números, " ", "", NaN y textos."""
+    return pd.DataFrame({
+        "UNIDAD": [f"TRHU{i:07d}" for i in range(8)],
+        "SENSOR1_TMP": [-18.5, np.nan, " ", "", np.nan, "  ", np.nan, 3],
+        "SENSOR2_TMP": [np.nan, np.nan, np.nan, "4.2", " ", np.nan, np.nan, np.nan],
+        "SENSOR3_TMP": [np.nan, 0.0, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan],
+        # SENSOR4_TMP no viene
+    })
+
+
+@pytest.mark.parametrize("columnas", [
+    ["UNIDAD", "SENSOR1_TMP", "SENSOR2_TMP", "SENSOR3_TMP"],
+    ["UNIDAD", "SENSOR3_TMP"],   # Solo numérica
+    ["UNIDAD", "SENSOR1_TMP"],   # Solo mezclada
+    ["UNIDAD"],                  # Sin sensores
+])
+def test_clasificar_reefer_igual_a_fila_a_fila(columnas):
+    df = monitor_real()[columnas]
+    pd.testing.assert_series_equal(ingesta.clasificar_reefer(df), df.apply(es_reefer_ct, axis=1), check_names=False)
+
+
+def test_clasificar_reefer_aleatorio():
+    rng = np.random.default_rng(0)
+    opciones = np.array([np.nan, " ", "", "  ", -20.0, 0.0, "5.1", 7], dtype=object)
+    df = pd.DataFrame({col: rng.choice(opciones, 500) for col in ingesta.COLS_SENSORES[:3]})
+    df["SENSOR3_TMP"] = pd.to_numeric(df["SENSOR3_TMP"], errors="coerce")
+    pd.testing.assert_series_equal(ingesta.clasificar_reefer(df), df.apply(es_reefer_ct, axis=1), check_names=False)
+
+
+def tipos(con):
+    return dict(con.execute(f"SELECT UNIDAD, TIPO_CONTENEDOR FROM {almacen.TABLA_MAESTRO}").fetchall())
+
+
+def test_upsert_reclasifica_solo_el_lote(tmp_path):
+    con = almacen.conectar_maestro(str(tmp_path / "maestro.db"), str(tmp_path / "no_existe.xlsx"))
+    try:
+        almacen.upsert_maestro(con, pd.DataFrame({"UNIDAD": ["A", "B"], "SENSOR1_TMP": [np.nan, -18.0]}))
+        assert tipos(con) == {"A": "General", "B": "CT"}
+
+        # Una marca en B muestra si se vuelve a clasificar
+        with con: con.execute(f"UPDATE {almacen.TABLA_MAESTRO} SET TIPO_CONTENEDOR = 'X' WHERE UNIDAD = 'B'")
+        almacen.upsert_maestro(con, pd.DataFrame({"UNIDAD": ["A"], "SENSOR1_TMP": [" "], "SENSOR2_TMP": [2.5]}))
+        assert tipos(con) == {"A": "CT", "B": "X"}
+    finally: con.close()